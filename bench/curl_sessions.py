@@ -0,0 +1,111 @@
+"""
+Benchmark for the curl_cffi fetch path: one request per `requests.get` call
+(fresh TCP+TLS handshake every time) versus the pooled, keep-alive sessions of
+`SessionPool`.
+
+Runs against a local HTTPS stand-in server with a self-signed certificate
+(needs the `openssl` binary). `--connect-delay` adds a sleep to every new
+connection to stand in for the network round trips of a real handshake.
+
+Usage:
+    python -m bench.curl_sessions --requests 500 --threads 8 --connect-delay 20
+"""
+import argparse
+import concurrent.futures
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from curl_cffi import requests
+
+from lib.fetch._curl_cffi import SessionPool
+
+PAGE = b"<html><body>" + b"<article data-adid='1'></article>" * 500 + b"</body></html>"
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HTTPSServer(ThreadingHTTPServer):
+    daemon_threads = True
+    connect_delay = 0.0
+    connections = 0
+
+    def finish_request(self, request, client_address):
+        self.connections += 1
+        time.sleep(self.connect_delay)
+        super().finish_request(request, client_address)
+
+
+def start_server(connect_delay: float) -> HTTPSServer:
+    cert_dir = Path(tempfile.mkdtemp())
+    cert, key = cert_dir / "cert.pem", cert_dir / "key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-keyout", str(key), "-out", str(cert)],
+        check=True,
+        capture_output=True,
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+
+    server = HTTPSServer(("127.0.0.1", 0), PageHandler)
+    server.connect_delay = connect_delay
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(fetch, url: str, total: int, threads: int) -> float:
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        for html in executor.map(lambda _: fetch(url), range(total)):
+            assert len(html) == len(PAGE)
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--connect-delay", type=float, default=20, help="ms slept per new connection")
+    args = parser.parse_args()
+
+    server = start_server(args.connect_delay / 1000)
+    url = f"https://localhost:{server.server_address[1]}/s-wohnung-mieten/c203l1"
+
+    def fetch_unpooled(url: str) -> str:
+        return requests.get(url, impersonate="chrome", verify=False).text
+
+    pool = SessionPool(size=args.threads, verify=False)
+
+    def fetch_pooled(url: str) -> str:
+        with pool.session(url) as session:
+            return session.get(url).text
+
+    for name, fetch in (("requests.get", fetch_unpooled), ("SessionPool", fetch_pooled)):
+        server.connections = 0
+        rate = run(fetch, url, args.requests, args.threads)
+        print(f"{name:<14} {rate:8.1f} req/s  {server.connections:>5} connections")
+
+    pool.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
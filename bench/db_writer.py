@@ -0,0 +1,91 @@
+"""
+Benchmark for listing writes: one `set_new_listing_data` statement per page
+versus the write-behind `ListingWriter` with COPY batches.
+
+Needs a local Postgres. The tables of bench/schema.sql are created if they
+don't exist; only rows with a "bench-" external id are written and they are
+deleted again afterwards.
+
+Usage:
+    python -m bench.db_writer --dsn postgresql://postgres@localhost/bench --pages 400 --threads 8
+"""
+import argparse
+import concurrent.futures
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import psycopg
+from psycopg_pool import ConnectionPool
+
+from lib.database import Database
+from lib.models import ListingSource, NewListing
+from lib.writer import ListingWriter
+
+SCHEMA = Path(__file__).with_name("schema.sql")
+
+
+def make_pages(pages: int, per_page: int) -> list[list[NewListing]]:
+    run = uuid.uuid4().hex[:8]
+    now = datetime.now(timezone.utc)
+    return [
+        [
+            NewListing(
+                external_id=f"bench-{run}-{page}-{i}",
+                source=ListingSource.IMMOWELT,
+                modified_at=now,
+                created_at=now,
+            )
+            for i in range(per_page)
+        ]
+        for page in range(pages)
+    ]
+
+
+def per_page(db: Database, pages: list[list[NewListing]], threads: int) -> float:
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(db.set_new_listing_data, pages))
+    return time.perf_counter() - start
+
+
+def write_behind(db: Database, pages: list[list[NewListing]], threads: int, batch_size: int) -> tuple[float, int]:
+    writer = ListingWriter(db, batch_size=batch_size)
+    writer.start()
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(writer.put, pages))
+    writer.close()
+    return time.perf_counter() - start, writer.batches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--per-page", type=int, default=25)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        conn.execute(SCHEMA.read_text())
+
+    pool = ConnectionPool(args.dsn, kwargs={"row_factory": psycopg.rows.dict_row}, max_size=args.threads, open=True)
+    db = Database(pool=pool)
+    total = args.pages * args.per_page
+    try:
+        elapsed = per_page(db, make_pages(args.pages, args.per_page), args.threads)
+        print(f"set_new_listing_data  {total / elapsed:9.0f} listings/s  {args.pages} transactions")
+
+        elapsed, batches = write_behind(db, make_pages(args.pages, args.per_page), args.threads, args.batch_size)
+        print(f"ListingWriter (COPY)  {total / elapsed:9.0f} listings/s  {batches} transactions")
+    finally:
+        with pool.connection() as conn:
+            conn.execute("DELETE FROM fixnflip_v2.property WHERE external_id LIKE 'bench-%'")
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+End-to-end throughput benchmark of `BaseFinder.run` / `run_async`:
+fetch -> parse -> write, against local stand-ins for the site and the DB.
+
+A local HTTP server serves Kleinanzeigen-like result pages (synthetic, or
+the recorded pages of a corpus) with a configurable latency and rate of
+errors (503) and bot check pages. The Kleinanzeigen finder is pointed at it
+and writes either into a local Postgres (`--dsn`, tables of bench/schema.sql,
+rows are deleted afterwards) or into an in-memory stand-in that sleeps
+`--db-latency` ms per transaction.
+
+Every combination of `--engine` and `--workers` is run once (workers is
+`max_workers` for the thread engine and the concurrency of the async one).
+The report has listings/s, requests/s, DB transactions/s and the busy time
+per stage, summed over all threads. The rate limiter is off unless
+`--rate-limit` is given, so the numbers show the pipeline, not the limiter.
+
+Usage:
+    python -m bench.e2e --locations 20 --pages 5 --latency 50 --workers 2,4,8,16
+    python -m bench.e2e --engine threads,async --error-rate 0.02 --bot-rate 0.01
+    python -m bench.e2e --dsn postgresql://postgres@localhost/bench --direct-writes
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+import find.base
+from find.kleinanzeigen import KleinanzeigenFinder
+from lib.fetch.corpus import PageCorpus
+from lib.fetch.rate_limiter import get_rate_limiter
+from lib.listing_index import ListingIndex
+
+SCHEMA = Path(__file__).with_name("schema.sql")
+BOT_PAGE = b"<html><body><h1>Ich bin kein Roboter</h1><div class='captcha'></div></body></html>"
+
+
+# --- Site stand-in ---
+
+class Site:
+    """What the local server serves; `run` changes per benchmark so every run writes new listings."""
+
+    def __init__(self, pages: int, latency: float, error_rate: float, bot_rate: float, corpus: list[bytes]):
+        self.pages = pages
+        self.latency = latency
+        self.error_rate = error_rate
+        self.bot_rate = bot_rate
+        self.corpus = corpus
+        self.run = ""
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def page(self, path: str) -> bytes:
+        if self.corpus:
+            return self.corpus[hash(path) % len(self.corpus)]
+        page = int(path.split("seite:")[1].split("/")[0]) if "seite:" in path else 1
+        unit = path.rsplit("/", 1)[-1]
+        ads = "".join(
+            f'<li><article class="aditem" data-adid="bench-{self.run}-{unit}-{page}-{i}">'
+            f"<h2><a href='/s-anzeige/{i}'>Wohnung {i}</a></h2></article></li>"
+            for i in range(KleinanzeigenFinder.LISTINGS_PER_PAGE)
+        )
+        total = self.pages * KleinanzeigenFinder.LISTINGS_PER_PAGE
+        return (
+            f'<html><body><div class="breadcrump"><span class="breadcrump-summary">'
+            f"{(page - 1) * 25 + 1} - {page * 25} von {total} Ergebnissen</span></div>"
+            f'<ul id="srchrslt-adtable">{ads}</ul></body></html>'
+        ).encode()
+
+
+def start_server(site: Site) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            with site._lock:
+                site.requests += 1
+            time.sleep(site.latency)
+            roll = random.random()
+            if roll < site.error_rate:
+                status, body = 503, b"Service Unavailable"
+            elif roll < site.error_rate + site.bot_rate:
+                status, body = 200, BOT_PAGE
+            else:
+                status, body = 200, site.page(self.path)
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# --- DB stand-in ---
+
+class StandInDatabase:
+    """The `Database` methods the finder uses, sleeping `latency` seconds per transaction."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def _transaction(self):
+        time.sleep(self.latency)
+
+    def set_new_listing_data(self, listings):
+        self._transaction()
+
+    def bulk_upsert_listings(self, listings):
+        self._transaction()
+
+    def touch_listings(self, source, external_ids):
+        self._transaction()
+
+    def get_known_listings(self, source, external_ids):
+        self._transaction()
+        return {}
+
+    def stream_listing_modified_at(self, source):
+        return iter(())
+
+    def pool_summary(self) -> str:
+        return "DB stand-in"
+
+
+# --- Instrumentation ---
+
+class Stages:
+    """Busy time and calls per pipeline stage, summed over all threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds: dict[str, float] = defaultdict(float)
+        self.calls: dict[str, int] = defaultdict(int)
+        self.listings = 0
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.seconds[stage] += seconds
+            self.calls[stage] += 1
+
+    def wrap(self, stage: str, fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed_async(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    self.add(stage, time.perf_counter() - start)
+            return timed_async
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return timed
+
+
+DB_WRITES = ("set_new_listing_data", "bulk_upsert_listings", "touch_listings")
+
+
+def make_finder(base_url: str, db, locations: int, stages: Stages, direct_writes: bool):
+    class BenchFinder(KleinanzeigenFinder):
+        BASE_URL = base_url
+
+        def get_locations(self):
+            return [str(1000 + i) for i in range(locations)]
+
+        def load_listing_index(self):
+            # Empty in-memory index: the production path, without touching the snapshot in cache/
+            self.listing_index = ListingIndex()
+
+        def save_listing_index(self):
+            pass
+
+        def load_location_stats(self):
+            # Every run crawls every location, and leaves no stats in cache/ for production runs to plan with
+            self.location_stats = None
+
+        def open_checkpoint(self):
+            # Nor a checkpoint that a production run with --resume would continue from
+            self.checkpoint = None
+
+        def write_metrics(self):
+            pass
+
+        def start_writer(self):
+            if not direct_writes:
+                super().start_writer()
+
+        def get_listings(self, page):
+            listings = super().get_listings(page)
+            with stages._lock:
+                stages.listings += len(listings)
+            return listings
+
+    # Hand the finder our DB instead of letting it open the configured pool
+    with mock.patch.object(find.base, "Database", lambda: db):
+        finder = BenchFinder()
+    finder.fetcher.fetch = stages.wrap("fetch", finder.fetcher.fetch)
+    finder.fetcher.fetch_async = stages.wrap("fetch", finder.fetcher.fetch_async)
+    finder.get_listings = stages.wrap("parse", finder.get_listings)
+    finder.get_pages_count = stages.wrap("parse", finder.get_pages_count)
+    return finder
+
+
+def run_once(site: Site, base_url: str, db, args, engine: str, workers: int) -> dict:
+    site.run = uuid.uuid4().hex[:8]
+    site.requests = 0
+    stages = Stages()
+    for name in DB_WRITES:
+        setattr(db, name, stages.wrap("db", getattr(type(db), name).__get__(db)))
+
+    finder = make_finder(base_url, db, args.locations, stages, args.direct_writes)
+    finder.max_workers = finder.per_host_limit = finder.concurrency = workers
+
+    start = time.perf_counter()
+    if engine == "async":
+        asyncio.run(finder.run_async())
+    else:
+        finder.run()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "engine": engine,
+        "workers": workers,
+        "seconds": elapsed,
+        "listings_per_second": stages.listings / elapsed,
+        "requests_per_second": site.requests / elapsed,
+        "db_transactions_per_second": stages.calls["db"] / elapsed,
+        "stage_seconds": {stage: stages.seconds[stage] for stage in ("fetch", "parse", "db")},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--locations", type=int, default=10, help="locations per category (4 categories)")
+    parser.add_argument("--pages", type=int, default=5, help="result pages per location")
+    parser.add_argument("--latency", type=float, default=50, help="server latency in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--bot-rate", type=float, default=0.0)
+    parser.add_argument("--corpus", type=Path, help="serve the recorded Kleinanzeigen pages of this corpus")
+    parser.add_argument("--dsn", help="local Postgres to write into, instead of the stand-in")
+    parser.add_argument("--db-latency", type=float, default=5, help="stand-in latency per transaction in ms")
+    parser.add_argument("--direct-writes", action="store_true", help="write every page itself, no write-behind")
+    parser.add_argument("--engine", default="threads", help="comma-separated: threads,async")
+    parser.add_argument("--workers", default="2,4,8", help="comma-separated max_workers / concurrency values")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the AIMD rate limiter on")
+    parser.add_argument("--output", type=Path, help="append the results to this JSON lines file")
+    args = parser.parse_args()
+
+    # Only warnings and errors, the per-page log lines would dominate the run
+    logging.disable(logging.INFO)
+    get_rate_limiter().enabled = args.rate_limit
+
+    corpus = []
+    if args.corpus:
+        corpus = [html.encode() for _, _, html in PageCorpus(args.corpus.resolve()).pages("www.kleinanzeigen.de")]
+    site = Site(args.pages, args.latency / 1000, args.error_rate, args.bot_rate, corpus)
+    server = start_server(site)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    pool = None
+    if args.dsn:
+        import psycopg
+        from psycopg_pool import ConnectionPool
+
+        from lib.database import Database
+
+        with psycopg.connect(args.dsn, autocommit=True) as conn:
+            conn.execute(SCHEMA.read_text())
+        max_workers = max(int(w) for w in args.workers.split(","))
+        pool = ConnectionPool(
+            args.dsn, kwargs={"row_factory": psycopg.rows.dict_row}, max_size=max_workers + 1, open=True
+        )
+        db = Database(pool=pool)
+    else:
+        db = StandInDatabase(args.db_latency / 1000)
+
+    results = []
+    try:
+        for engine in args.engine.split(","):
+            for workers in (int(w) for w in args.workers.split(",")):
+                r = run_once(site, base_url, db, args, engine, workers)
+                results.append(r)
+                stages = "  ".join(f"{stage} {seconds:6.1f}s" for stage, seconds in r["stage_seconds"].items())
+                print(
+                    f"{engine:<7} workers {workers:>3}  {r['seconds']:6.1f}s  "
+                    f"{r['listings_per_second']:8.0f} listings/s  {r['requests_per_second']:6.1f} req/s  "
+                    f"{r['db_transactions_per_second']:6.1f} tx/s  |  {stages}"
+                )
+    finally:
+        if pool is not None:
+            with pool.connection() as conn:
+                conn.execute("DELETE FROM fixnflip_v2.property WHERE external_id LIKE 'bench-%'")
+            pool.close()
+        server.shutdown()
+
+    if args.output:
+        with args.output.open("a", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps(r) + "\n")
+
+
+if __name__ == "__main__":
+    main()
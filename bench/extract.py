@@ -0,0 +1,76 @@
+"""
+Benchmark for the result page extractors: the raw HTML fast path of
+`lib.extract` versus the BeautifulSoup path it falls back to.
+
+Reads saved result pages (e.g. "Save page as..." from the browser or the
+HTML logged by a failed run), checks that both paths extract the same JSON
+payload and page count, and reports the CPU time per page of each.
+
+Usage:
+    python -m bench.extract immoscout pages/immoscout/*.html --repeat 5
+    python -m bench.extract immowelt pages/immowelt/*.html
+"""
+import argparse
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from find.immoscout import ImmoscoutFinder
+from find.immowelt import ImmoweltFinder
+from lib.extract import ResultPage
+from lib.logger import get_logger
+
+FINDERS = {"immoscout": ImmoscoutFinder, "immowelt": ImmoweltFinder}
+
+
+def make_finder(name: str):
+    # Only the parsing methods are used, so skip __init__ (DB pool, fetcher, browser)
+    cls = FINDERS[name]
+    finder = cls.__new__(cls)
+    finder.logger = get_logger(cls.__name__)
+    return finder
+
+
+def fast(finder, html: str):
+    page = ResultPage(html)
+    return finder.get_json_data(page), finder.get_pages_count(page)
+
+
+def soup(finder, html: str):
+    tree = BeautifulSoup(html, "lxml")
+    return finder.get_json_data_from_soup(tree), finder.get_pages_count_from_soup(tree)
+
+
+def measure(fn, finder, pages: list[str], repeat: int) -> float:
+    start = time.process_time()
+    for _ in range(repeat):
+        for html in pages:
+            fn(finder, html)
+    return (time.process_time() - start) / (repeat * len(pages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("finder", choices=FINDERS)
+    parser.add_argument("pages", nargs="+", type=Path)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    finder = make_finder(args.finder)
+    pages = [path.read_text(encoding="utf-8") for path in args.pages]
+
+    for path, html in zip(args.pages, pages):
+        if fast(finder, html) != soup(finder, html):
+            raise SystemExit(f"{path}: fast path and BeautifulSoup disagree")
+
+    fast_seconds = measure(fast, finder, pages, args.repeat)
+    soup_seconds = measure(soup, finder, pages, args.repeat)
+    size = sum(len(html) for html in pages) / len(pages) / 1024
+    print(f"{len(pages)} pages, avg {size:.0f} KB")
+    print(f"BeautifulSoup  {soup_seconds * 1000:8.2f} ms CPU/page")
+    print(f"fast path      {fast_seconds * 1000:8.2f} ms CPU/page  ({soup_seconds / fast_seconds:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Golden-file check for the finder parsers.
+
+Every `<corpus>/<source>/<name>.html` is parsed with the finder of that
+source and the listings and page count are compared with `<name>.json`.
+`--update` (re)writes the JSON files from the current parsers: record them
+before changing a parser, then run the check against the new one.
+
+Usage:
+    python -m bench.golden
+    python -m bench.golden --corpus path/to/pages --update
+"""
+import argparse
+import json
+from pathlib import Path
+
+from find.immoscout import ImmoscoutFinder
+from find.immowelt import ImmoweltFinder
+from find.kleinanzeigen import KleinanzeigenFinder
+from lib.extract import ResultPage
+from lib.logger import get_logger
+
+FINDERS = {cls.SOURCE.value: cls for cls in (ImmoscoutFinder, ImmoweltFinder, KleinanzeigenFinder)}
+CORPUS = Path(__file__).with_name("golden")
+
+
+def make_finder(source: str):
+    # Only the parsing methods are used, so skip __init__ (DB pool, fetcher, browser)
+    cls = FINDERS[source]
+    finder = cls.__new__(cls)
+    finder.logger = get_logger(cls.__name__)
+    return finder
+
+
+def parse(finder, html: str) -> dict:
+    page = ResultPage(html)
+    return {
+        "listings": [listing.model_dump(mode="json") for listing in finder.get_listings(page)],
+        "pages_count": finder.get_pages_count(page),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, default=CORPUS)
+    parser.add_argument("--update", action="store_true", help="write the expected results instead of checking them")
+    args = parser.parse_args()
+
+    checked = failed = 0
+    for source_dir in sorted(path for path in args.corpus.iterdir() if path.name in FINDERS):
+        finder = make_finder(source_dir.name)
+        for html_path in sorted(source_dir.glob("*.html")):
+            result = parse(finder, html_path.read_text(encoding="utf-8"))
+            expected_path = html_path.with_suffix(".json")
+            if args.update:
+                expected_path.write_text(json.dumps(result, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+            elif not expected_path.exists():
+                print(f"MISSING {expected_path}")
+                failed += 1
+            elif result != json.loads(expected_path.read_text(encoding="utf-8")):
+                print(f"FAIL    {html_path}")
+                failed += 1
+            checked += 1
+
+    action = "Recorded" if args.update else "Checked"
+    print(f"{action} {checked} pages, {failed} failed")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
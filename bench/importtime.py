@@ -0,0 +1,83 @@
+"""
+Import time of the finders, measured with `python -X importtime`.
+
+For every site a fresh interpreter imports the finder module and the fetch
+backend of its configured `find.<site>.method`, which is what a workflow run
+loads before the first request. The report has the total import time and the
+slowest packages (own time of all their modules, best of `--repeat` runs), and
+fails if a module of another backend or the GCP firewall client was imported.
+
+Usage:
+    python -m bench.importtime
+    python -m bench.importtime kleinanzeigen --repeat 5 --top 15
+"""
+import argparse
+import subprocess
+import sys
+from collections import Counter
+
+from lib.config import get_config
+
+SITES = ("immoscout", "immowelt", "kleinanzeigen")
+
+# Loaded only by the backends that need them, or only behind a proxy
+BACKEND_PACKAGES = {"curl_cffi": "curl_cffi", "seleniumbase": "seleniumbase"}
+LAZY_PACKAGES = ("google.cloud.compute_v1", "lib.proxy")
+
+
+def import_times(statement: str) -> dict[str, int]:
+    """Own import time in microseconds of every module imported by `statement` in a new interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement], capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(own)
+    return times
+
+
+def measure(site: str, method: str, repeat: int) -> dict[str, int]:
+    statement = (
+        f"import find.{site}; from lib.fetch.fetcher import get_backend; get_backend({method!r})"
+    )
+    best: dict[str, int] = {}
+    for _ in range(repeat):
+        for name, own in import_times(statement).items():
+            best[name] = min(best.get(name, own), own)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sites", nargs="*", default=SITES, help="sites to measure (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="interpreter starts per site, the best is reported")
+    parser.add_argument("--top", type=int, default=10, help="slowest packages to list")
+    args = parser.parse_args()
+
+    config = get_config()
+    failed = False
+    for site in args.sites:
+        method = getattr(config.find, site).method
+        times = measure(site, method, args.repeat)
+        packages = Counter()
+        for name, own in times.items():
+            packages[name.split(".")[0]] += own
+        print(f"{site} ({method}): {len(times)} modules in {sum(times.values()) / 1000:.0f} ms")
+        for package, own in packages.most_common(args.top):
+            print(f"  {own / 1000:8.1f} ms  {package}")
+
+        unexpected = [
+            package for other, package in BACKEND_PACKAGES.items() if other != method and package in times
+        ] + [package for package in LAZY_PACKAGES if package in times]
+        if unexpected:
+            failed = True
+            print(f"  imported but not needed: {', '.join(unexpected)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
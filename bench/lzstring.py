@@ -0,0 +1,57 @@
+"""
+Micro-benchmark for the Immowelt payload decoder: `lib.lzstring` versus the
+pure-Python `lzstring` package it replaced.
+
+Takes saved Immowelt result pages (the `classified-serp-init-data` payload is
+extracted from them) or files that contain just the Base64 payload, checks
+that both decoders give identical output and reports the time per payload.
+
+Usage:
+    python -m bench.lzstring pages/immowelt/*.html --repeat 5
+"""
+import argparse
+import time
+from pathlib import Path
+
+from lzstring import LZString
+
+from lib.extract import immowelt_serp_data
+from lib.lzstring import decompress_from_base64
+
+
+def load_payload(path: Path) -> str:
+    text = path.read_text(encoding="utf-8")
+    payload = immowelt_serp_data(text)
+    return payload if payload is not None else text.strip()
+
+
+def measure(decode, payloads: list[str], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for payload in payloads:
+            decode(payload)
+    return (time.perf_counter() - start) / (repeat * len(payloads))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payloads = [load_payload(path) for path in args.files]
+    reference = LZString().decompressFromBase64
+    for path, payload in zip(args.files, payloads):
+        if decompress_from_base64(payload) != reference(payload):
+            raise SystemExit(f"{path}: decoders disagree")
+
+    library_seconds = measure(reference, payloads, args.repeat)
+    fast_seconds = measure(decompress_from_base64, payloads, args.repeat)
+    size = sum(len(payload) for payload in payloads) / len(payloads) / 1024
+    print(f"{len(payloads)} payloads, avg {size:.0f} KB")
+    print(f"lzstring package  {library_seconds * 1000:8.2f} ms/payload")
+    print(f"lib.lzstring      {fast_seconds * 1000:8.2f} ms/payload  ({library_seconds / fast_seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Parser benchmark over a recorded page corpus (see `--record` on the finders).
+
+Runs `get_listings` and `get_pages_count` of each finder over every captured
+page of its host and reports pages/s, p50/p99 latency per page, parse errors
+and the peak RSS of the process. `--output` appends the results as a JSON
+line, so runs can be compared over time.
+
+Usage:
+    python -m find.kleinanzeigen --record corpus        # record a run first
+    python -m bench.parsers corpus --repeat 3 --output parsers.jsonl
+"""
+import argparse
+import json
+import resource
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from bench.golden import FINDERS, make_finder
+from lib.extract import ResultPage
+from lib.fetch.corpus import PageCorpus
+
+HOSTS = {urlsplit(cls.BASE_URL).netloc: source for source, cls in FINDERS.items()}
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def bench_host(corpus: PageCorpus, host: str, repeat: int) -> dict:
+    finder = make_finder(HOSTS[host])
+    pages = [html for _, _, html in corpus.pages(host)]
+    latencies: list[float] = []
+    listings = errors = 0
+    for _ in range(repeat):
+        for html in pages:
+            start = time.perf_counter()
+            try:
+                page = ResultPage(html)
+                listings += len(finder.get_listings(page))
+                finder.get_pages_count(page)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    return {
+        "source": HOSTS[host],
+        "pages": len(pages),
+        "pages_per_second": len(latencies) / sum(latencies),
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "listings_per_page": listings / len(latencies),
+        "errors": errors // repeat,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", type=Path)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="append the results to this JSON lines file")
+    args = parser.parse_args()
+
+    corpus = PageCorpus(args.corpus.resolve())
+    hosts = [host for host in corpus.hosts() if host in HOSTS]
+    if not hosts:
+        raise SystemExit(f"No pages of a known host in {corpus.root}")
+
+    results = [bench_host(corpus, host, args.repeat) for host in hosts]
+    # ru_maxrss is in KB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    for r in results:
+        print(
+            f"{r['source']:<14} {r['pages']:>5} pages  {r['pages_per_second']:8.1f} pages/s  "
+            f"p50 {r['p50_ms']:7.2f} ms  p99 {r['p99_ms']:7.2f} ms  "
+            f"{r['listings_per_page']:5.1f} listings/page  {r['errors']} errors"
+        )
+    print(f"peak RSS {peak_rss_mb:.0f} MB")
+
+    if args.output:
+        record = {"at": datetime.now(timezone.utc).isoformat(), "results": results, "peak_rss_mb": peak_rss_mb}
+        with args.output.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
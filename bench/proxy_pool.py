@@ -0,0 +1,145 @@
+"""
+Proxy rotation of `Fetcher` over local stand-in proxies.
+
+Every `--proxy LATENCY_MS[:ERROR_RATE[:BOT_RATE]]` starts a forwarding HTTP
+proxy in its own process that adds that latency to every request and answers
+a share of them with a 502 or a bot check page. The fetcher gets all of them
+as one comma-separated proxy URL and fetches `--requests` pages of a local
+site from `--threads` threads. `--kill SECONDS` terminates the first proxy
+after that time, to check that its requests move to the others.
+
+The report has the failed fetches (on errors and on bot checks) and
+the pool's view of every proxy: requests, errors, latency and quarantines.
+A healthy proxy should carry most of the load; a slow one less, a broken one
+almost none once it is quarantined.
+
+Usage:
+    python -m bench.proxy_pool
+    python -m bench.proxy_pool --proxy 20 --proxy 200 --proxy 20:0.5 --proxy 20:0:0.8 --requests 400
+    python -m bench.proxy_pool --proxy 20 --proxy 20 --kill 2 --threads 8
+"""
+import argparse
+import concurrent.futures
+import logging
+import multiprocessing
+import random
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from bench.e2e import BOT_PAGE, Site, start_server
+from lib.config import get_config
+from lib.exceptions import BotDetectionError
+from lib.fetch.fetcher import Fetcher
+from lib.fetch.rate_limiter import get_rate_limiter
+
+DEFAULT_PROXIES = ["20", "150", "20:0.5", "20:0:0.8"]
+
+
+def run_proxy(ready, latency: float, error_rate: float, bot_rate: float):
+    """Forwards absolute-form GET requests to the origin, with the given latency and failures."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            roll = random.random()
+            if roll < error_rate:
+                status, body = 502, b"Bad Gateway"
+            elif roll < error_rate + bot_rate:
+                status, body = 200, BOT_PAGE
+            else:
+                try:
+                    with urllib.request.urlopen(self.path, timeout=10) as response:
+                        status, body = response.status, response.read()
+                except urllib.error.HTTPError as e:
+                    status, body = e.code, e.read()
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_proxies(specs: list[str]) -> tuple[list[multiprocessing.Process], list[str]]:
+    processes, urls = [], []
+    ready = multiprocessing.Queue()
+    for spec in specs:
+        latency, error_rate, bot_rate = (spec.split(":") + ["0", "0"])[:3]
+        process = multiprocessing.Process(
+            target=run_proxy, args=(ready, float(latency) / 1000, float(error_rate), float(bot_rate)), daemon=True
+        )
+        process.start()
+        urls.append(f"http://127.0.0.1:{ready.get(timeout=10)}")
+        processes.append(process)
+    return processes, urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--proxy", action="append", metavar="SPEC", help="LATENCY_MS[:ERROR_RATE[:BOT_RATE]]")
+    parser.add_argument("--requests", type=int, default=200, help="pages to fetch")
+    parser.add_argument("--threads", type=int, default=4, help="concurrent fetches")
+    parser.add_argument("--kill", type=float, help="terminate the first proxy after this many seconds")
+    parser.add_argument(
+        "--block-retry-delay", type=float, default=0.5, help="first retry delay after a bot check, in seconds"
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    get_rate_limiter().enabled = False
+    get_config().curl_cffi.block_retry_delay = args.block_retry_delay
+    specs = args.proxy or DEFAULT_PROXIES
+    processes, urls = start_proxies(specs)
+    site = Site(3, 0.0, 0.0, 0.0, [])
+    server = start_server(site)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    # Local proxies, no firewall rule to open
+    with mock.patch("lib.fetch.fetcher._new_firewall_manager"):
+        fetcher = Fetcher("curl_cffi", proxy_url=",".join(urls))
+
+    failed = blocked = 0
+
+    def fetch(i: int):
+        nonlocal failed, blocked
+        try:
+            fetcher.fetch(f"{base_url}s-wohnung/seite:{i % 3 + 1}/c203l{i}")
+        except BotDetectionError:
+            blocked += 1
+        except Exception:
+            failed += 1
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(args.threads) as executor:
+        futures = [executor.submit(fetch, i) for i in range(args.requests)]
+        if args.kill:
+            time.sleep(args.kill)
+            processes[0].terminate()
+            print(f"Terminated proxy {urls[0]} after {args.kill}s")
+        concurrent.futures.wait(futures)
+    elapsed = time.perf_counter() - start
+
+    fetcher.close()
+    server.shutdown()
+    for process in processes:
+        process.terminate()
+
+    print(f"{args.requests} fetches in {elapsed:.1f}s: {failed} failed, {blocked} failed on bot checks")
+    for spec, line in zip(specs, fetcher.proxies.summary()):
+        print(f"  [{spec:>10}] {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+-- Minimal stand-in for the fixnflip_v2 tables the finders write to.
+-- Only for local benchmarks: point the bench scripts at a scratch database.
+CREATE SCHEMA IF NOT EXISTS fixnflip_v2;
+
+-- source is an enum in the real schema, so writes must not rely on text
+DO $$
+BEGIN
+    CREATE TYPE fixnflip_v2.listing_source AS ENUM ('kleinanzeigen', 'immoscout', 'immowelt');
+EXCEPTION
+    WHEN duplicate_object THEN NULL;
+END
+$$;
+
+CREATE TABLE IF NOT EXISTS fixnflip_v2.property (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    source fixnflip_v2.listing_source NOT NULL,
+    external_id text NOT NULL,
+    modified_at timestamptz,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    UNIQUE (external_id, source)
+);
+
+CREATE TABLE IF NOT EXISTS fixnflip_v2.general (
+    property_id uuid PRIMARY KEY REFERENCES fixnflip_v2.property (id) ON DELETE CASCADE,
+    active boolean NOT NULL DEFAULT TRUE
+);
+
+CREATE TABLE IF NOT EXISTS fixnflip_v2.system (
+    property_id uuid PRIMARY KEY REFERENCES fixnflip_v2.property (id) ON DELETE CASCADE,
+    last_seen_at timestamptz
+);
@@ -0,0 +1,113 @@
+"""
+Sharded crawl with several worker processes against a local Postgres work
+queue (`--shard` mode of the finders).
+
+The local site of bench.e2e serves Kleinanzeigen-like pages; every worker
+process runs the Kleinanzeigen finder with the same crawl id and the DB
+stand-in for the listing writes, so only the `crawl_queue` table is used.
+`--kill SECONDS` terminates the first worker after that time, to check that
+its locations are taken over once their leases expire (`--lease`).
+
+The report has the status of every unit and the URLs that were fetched more
+than once; without `--kill` there should be none.
+
+Usage:
+    python -m bench.shard --dsn postgresql://postgres@localhost/bench --workers 4 --locations 20
+    python -m bench.shard --dsn postgresql://postgres@localhost/bench --workers 3 --kill 2 --lease 5
+"""
+import argparse
+import logging
+import multiprocessing
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+import psycopg
+from psycopg_pool import ConnectionPool
+
+from bench.e2e import Site, Stages, StandInDatabase, make_finder, start_server
+from lib.fetch.rate_limiter import get_rate_limiter
+from lib.work_queue import WorkQueue
+
+MIGRATION = Path(__file__).resolve().parent.parent / "migrations" / "crawl_queue.sql"
+
+
+def run_worker(base_url: str, args, crawl_id: str):
+    logging.disable(logging.INFO)
+    get_rate_limiter().enabled = False
+    finder = make_finder(base_url, StandInDatabase(0.001), args.locations, Stages(), direct_writes=False)
+    pool = ConnectionPool(args.dsn, kwargs={"row_factory": psycopg.rows.dict_row}, max_size=4, open=True)
+    finder.work_queue = WorkQueue(finder.SOURCE, crawl_id, pool=pool)
+    finder.work_queue.lease = args.lease
+    finder.work_queue.heartbeat = args.lease / 3
+    finder.work_queue.poll = 1
+    try:
+        finder.run()
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", required=True, help="local Postgres for the work queue table")
+    parser.add_argument("--workers", type=int, default=3, help="worker processes")
+    parser.add_argument("--locations", type=int, default=10, help="locations per category (4 categories)")
+    parser.add_argument("--pages", type=int, default=3, help="result pages per location")
+    parser.add_argument("--latency", type=float, default=20, help="server latency in ms")
+    parser.add_argument("--lease", type=float, default=10, help="lease of a claimed location in seconds")
+    parser.add_argument("--kill", type=float, help="terminate the first worker after this many seconds")
+    args = parser.parse_args()
+
+    site = Site(args.pages, args.latency / 1000, 0.0, 0.0, [])
+    site.run = uuid.uuid4().hex[:8]
+    fetched: Counter[str] = Counter()
+    page = site.page
+
+    def counting_page(path: str) -> bytes:
+        fetched[path] += 1
+        return page(path)
+
+    site.page = counting_page
+    server = start_server(site)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    crawl_id = f"bench-{site.run}"
+
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        conn.execute("CREATE SCHEMA IF NOT EXISTS fixnflip_v2")
+        conn.execute(MIGRATION.read_text())
+
+    start = time.perf_counter()
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(base_url, args, crawl_id), name=f"worker-{i}")
+        for i in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    if args.kill:
+        time.sleep(args.kill)
+        workers[0].terminate()
+        print(f"Terminated {workers[0].name} after {args.kill}s")
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        rows = conn.execute(
+            "SELECT status, worker, attempts FROM fixnflip_v2.crawl_queue WHERE crawl_id = %s", (crawl_id,)
+        ).fetchall()
+        conn.execute("DELETE FROM fixnflip_v2.crawl_queue WHERE crawl_id = %s", (crawl_id,))
+
+    print(f"{len(rows)} units in {elapsed:.1f}s, {sum(fetched.values())} pages fetched")
+    print("Status:", dict(Counter(status for status, _, _ in rows)))
+    print("Units per worker:", sorted(Counter(worker for _, worker, _ in rows).values()))
+    print("Taken over:", sum(attempts > 1 for _, _, attempts in rows))
+    duplicates = {path: count for path, count in fetched.items() if count > 1}
+    print(f"Fetched more than once: {len(duplicates)} URLs")
+    for path, count in sorted(duplicates.items())[:10]:
+        print(f"  {count}x {path}")
+
+
+if __name__ == "__main__":
+    main()
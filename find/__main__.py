@@ -0,0 +1,124 @@
+"""
+Runs several finders in one process, so the portals overlap in time instead
+of running one after another:
+
+    python -m find                          # every portal
+    python -m find kleinanzeigen immowelt --resume
+
+The finders share the DB pool, the curl_cffi sessions, the browsers (per
+proxy), the firewall authorisation and, on the thread engine, one scheduler
+of `runner.max_workers` workers (default: the sum of the finders'
+`max_workers`). Each portal stays within its own `per_host_limit`.
+"""
+import argparse
+import asyncio
+import sys
+import threading
+import time
+
+from lib.config import get_config
+from lib.fetch.fetcher import FetchPools
+from lib.logger import get_logger
+from lib.metrics import get_metrics
+from lib.profiling import profile_run
+from lib.scheduler import Scheduler
+
+from .base import BaseFinder
+from .immoscout import ImmoscoutFinder
+from .immowelt import ImmoweltFinder
+from .kleinanzeigen import KleinanzeigenFinder
+
+config = get_config()
+logger = get_logger("runner")
+
+FINDERS: dict[str, type[BaseFinder]] = {
+    finder.SOURCE.value: finder for finder in (ImmoscoutFinder, ImmoweltFinder, KleinanzeigenFinder)
+}
+
+
+def run_threads(finders: list[BaseFinder]) -> list[str]:
+    """Runs every finder in its own thread on one shared scheduler; returns the portals that failed."""
+    runner_config = getattr(config, "runner", None)
+    max_workers = getattr(runner_config, "max_workers", sum(finder.max_workers for finder in finders))
+    scheduler = Scheduler(max_workers)
+    failed = []
+
+    def run(finder: BaseFinder):
+        try:
+            finder.run(scheduler=scheduler)
+        except Exception as e:
+            logger.exception(f"{finder.SOURCE.value} failed: {e}")
+            failed.append(finder.SOURCE.value)
+
+    with scheduler:
+        threads = [threading.Thread(target=run, args=(finder,), name=finder.SOURCE.value) for finder in finders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    logger.info(scheduler.summary())
+    return failed
+
+
+async def run_async(finders: list[BaseFinder]) -> list[str]:
+    """Runs every finder's async engine on one event loop; returns the portals that failed."""
+    results = await asyncio.gather(*(finder.run_async() for finder in finders), return_exceptions=True)
+    failed = []
+    for finder, result in zip(finders, results):
+        if isinstance(result, BaseException):
+            logger.error(f"{finder.SOURCE.value} failed: {result!r}")
+            failed.append(finder.SOURCE.value)
+    return failed
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Run several finders in one process.")
+    parser.add_argument(
+        "portals", nargs="*", metavar="PORTAL", help=f"portals to run: {', '.join(FINDERS)} (default: all)"
+    )
+    parser.add_argument("--async", dest="use_async", action="store_true", help="run on the asyncio engine")
+    parser.add_argument(
+        "--full-sweep", action="store_true", help="crawl every page even if incremental mode is configured"
+    )
+    parser.add_argument("--resume", action="store_true", help="continue interrupted runs from their checkpoints")
+    parser.add_argument("--profile", metavar="MODES", help="profile the run, see lib/profiling.py")
+    args = parser.parse_args(argv)
+    unknown = set(args.portals) - set(FINDERS)
+    if unknown:
+        parser.error(f"unknown portals: {', '.join(sorted(unknown))}")
+
+    pools = FetchPools()
+    finders = []
+    for portal in args.portals or FINDERS:
+        finder = FINDERS[portal](pools=pools)
+        if args.full_sweep:
+            finder.incremental = False
+        finder.resume = args.resume
+        finder.shared_scheduler = True
+        finders.append(finder)
+
+    started = time.perf_counter()
+    logger.info(f"Running {', '.join(finder.SOURCE.value for finder in finders)}")
+    try:
+        with profile_run("find", modes=args.profile):
+            failed = asyncio.run(run_async(finders)) if args.use_async else run_threads(finders)
+    finally:
+        pools.close()
+
+    logger.info(f"All finders finished in {time.perf_counter() - started:.0f}s")
+    metrics = get_metrics()
+    for line in metrics.summary()[:10]:
+        logger.info(line)
+    try:
+        path = metrics.write("find")
+        if path:
+            logger.info(f"Metrics written to {path}.json / .prom")
+    except Exception as e:
+        logger.warning(f"Could not write metrics: {e}")
+    if failed:
+        logger.error(f"Failed: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
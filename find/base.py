@@ -1,108 +1,711 @@
+import argparse
+import asyncio
 import concurrent.futures
+import threading
+import time
 from abc import ABC, abstractmethod
-from bs4 import BeautifulSoup
+from collections import Counter
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+from urllib.parse import urlsplit
 from lib.logger import get_logger
-from lib.fetch.fetcher import Fetcher
+from lib.fetch.fetcher import FetchPools, Fetcher
 from lib.database import Database
+from lib.extract import ResultPage
 from lib.config import get_config
+from lib.checkpoint import Checkpoint, open_checkpoint
+from lib.exceptions import ListingWriteError
+from lib.helpers import to_epoch
+from lib.metrics import get_metrics
+from lib.profiling import profile_run
+from lib.listing_index import ListingIndex, load_listing_index, snapshot_path
+from lib.location_stats import LocationStats, load_location_stats
+from lib.models import ListingSource, NewListing
+from lib.scheduler import Scheduler
+from lib.work_queue import WorkQueue
+from lib.writer import ListingWriter
+
+
+@dataclass
+class PageResult:
+    pages_count: int = 0
+    listings: int = 0
+    # Listings that were not stored yet or have a new modified_at
+    changed: int = 0
+    failed: bool = False
 
 
 class BaseFinder(ABC):
     # Default behavior: Process locations sequentially (safer for tough sites like Immoscout)
     CONCURRENT_LOCATIONS = False
     CONCURRENT_PAGES = True
+    BASE_URL: str
+    SOURCE: ListingSource
     
-    def __init__(self, method: str, proxy_url: str | None): 
+    def __init__(self, method: str, proxy_url: str | None, pools: FetchPools | None = None):
         self.config = get_config()
         self.logger = get_logger(self.__class__.__name__)
         self.db = Database()
-        self.fetcher = Fetcher(method=method, proxy_url=proxy_url)
+        self.fetcher = Fetcher(method=method, proxy_url=proxy_url, pools=pools)
         # get worker based on method and config 
         # get max_workers based on method and config
         method_config = getattr(self.config, method)
         self.max_workers = method_config.max_workers
-        
+        # In-flight requests of the async engine
+        self.concurrency = getattr(method_config, "concurrency", self.max_workers)
+        # Requests at a time against this finder's host on the run-wide scheduler
+        self.per_host_limit = getattr(method_config, "per_host_limit", self.max_workers)
+        self.host = urlsplit(self.BASE_URL).netloc
+        self.scheduler: Scheduler | None = None
+        # True when the scheduler belongs to a runner of several finders (find/__main__.py)
+        self.shared_scheduler = False
+        # Known listings of this source, loaded at the start of a run
+        self.listing_index: ListingIndex | None = None
+        # Write-behind stage, pages hand their listings over instead of writing them
+        self.writer: ListingWriter | None = None
+        # (category, location, page) of the pages whose listings the writer failed to store; they fail the run
+        self.failed_writes: set[tuple] = set()
+        # Crawl progress, saved while running; `resume` continues an interrupted run
+        self.checkpoint: Checkpoint | None = None
+        self.resume = False
+        # Sharded mode: locations are claimed from a queue shared with other workers
+        self.work_queue: WorkQueue | None = None
+        # Queued or running page tasks per (category, location), to know when a location is finished
+        self._open_pages: Counter[tuple] = Counter()
+        self._open_pages_lock = threading.Lock()
+        # Yield of every location, to visit the productive ones first and skip the quiet ones (`location_stats.enabled`)
+        self.location_stats: LocationStats | None = None
+        # (category, location) -> [changed listings, requests, pages count] of the current visit
+        self._visits: dict[tuple, list] = {}
+        self._visits_lock = threading.Lock()
+
+        # Incremental mode: stop paging a location once it only shows known listings
+        self.site_config = getattr(self.config.find, self.SOURCE.value)
+        self.per_host_limit = getattr(self.site_config, "per_host_limit", self.per_host_limit)
+        incremental = getattr(self.site_config, "incremental", None)
+        self.incremental = bool(incremental and incremental.enabled)
+        self.stale_pages_limit = getattr(incremental, "stale_pages", 1)
+        full_sweep_weekday = getattr(incremental, "full_sweep_weekday", None)
+        if self.incremental and full_sweep_weekday == datetime.now().weekday():
+            self.logger.info("Full sweep day, incremental mode is off for this run")
+            self.incremental = False
+
     def fetch_html(self, url: str) -> str:
         return self.fetcher.fetch(url)
 
-    def run(self):
+    @property
+    def replaying(self) -> bool:
+        """
+        Pages come from an offline corpus. Such a run only reads: it writes no
+        listings to the DB and leaves the crawl state in cache/ (listing index
+        snapshot, checkpoint, location stats) as it is.
+        """
+        return self.fetcher.corpus_mode == "replay"
+
+    def run(self, scheduler: Scheduler | None = None):
         """
         Main strategy:
-        1. Iterate Categories
-        2. Iterate Locations (Concurrently OR Sequentially based on flag)
-        3. Iterate Pages (Concurrent by default for speed)
+        1. Iterate Categories and Locations, queueing page 1 of every location
+           (all at once OR one after another based on flag)
+        2. Page 1 queues the remaining pages of its location (concurrent by default)
+        All pages share one run-wide scheduler, so at most `max_workers` requests
+        run at a time and no worker idles between locations or categories.
+        With a work queue, locations are claimed from it instead, one at a time
+        (or `max_workers` at a time with concurrent locations).
+        A `scheduler` that is passed in is shared with other finders; it is
+        started and shut down by its owner, this run only waits for its host.
         """
-        for category_name, category in self.get_categories():
-            locations = self.get_locations()
-            
-            # Limit for testing
-            # locations = locations[:3] 
-            # locations = ["16315"]
+        started = time.perf_counter()
+        self.shared_scheduler = scheduler is not None
+        self.scheduler = scheduler or Scheduler(self.max_workers)
+        self.scheduler.set_host_limit(self.host, self.per_host_limit)
+        self.load_listing_index()
+        self.load_location_stats()
+        self.open_checkpoint()
+        self.start_writer()
+        completed = False
+        try:
+            with nullcontext() if self.shared_scheduler else self.scheduler:
+                units = []
+                for category_name, category in self.get_categories():
+                    locations = self.get_locations()
 
-            self.logger.info(
-                f"Starting crawl for {category_name} with {len(locations)} locations. "
-                f"Concurrency for locations: {'ON' if self.CONCURRENT_LOCATIONS else 'OFF'}. "
-                f"Concurrency for pages: {'ON' if self.CONCURRENT_PAGES else 'OFF'}."
-            )
+                    # Limit for testing
+                    # locations = locations[:3] 
+                    # locations = ["16315"]
 
-            if self.CONCURRENT_LOCATIONS:
-                # Parallel processing for sites that allow it (e.g. Kleinanzeigen)
-                with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                    futures = [
-                        executor.submit(self.process_location, category, location)
-                        for location in locations
-                    ]
-                    concurrent.futures.wait(futures)
-            else:
-                # Sequential processing for sensitive sites (e.g. Immoscout or Immowelt)
-                for location in locations:
-                    self.process_location(category, location)
-
-    def process_location(self, category, location):
-        """Strategy for a single location."""
-        # 1. Process Page 1 and get total page count
-        pages_count = self.process_page_strategy(category, location, page=1)
-        
-        # 2. If more pages, process them concurrently
-        if pages_count > 1 and self.CONCURRENT_PAGES:
-            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                futures = [
-                    executor.submit(self.process_page_strategy, category, location, page)
-                    for page in range(2, pages_count + 1)
-                ]
-                concurrent.futures.wait(futures)
+                    self.logger.info(
+                        f"Queueing crawl for {category_name} with {len(locations)} locations. "
+                        f"Concurrency for locations: {'ON' if self.CONCURRENT_LOCATIONS else 'OFF'}. "
+                        f"Concurrency for pages: {'ON' if self.CONCURRENT_PAGES else 'OFF'}. "
+                        f"Incremental: {'ON' if self.incremental else 'OFF'}."
+                    )
+                    units.extend((category, location) for location in locations)
+
+                units = self.plan_locations(self.unfinished_units(units))
+                if self.work_queue is not None:
+                    # Sharded: a finished location claims the next one from the queue
+                    self.work_queue.start(units)
+                    for _ in range(self.max_workers if self.CONCURRENT_LOCATIONS else 1):
+                        self.claim_next_location()
+                elif self.CONCURRENT_LOCATIONS:
+                    # Parallel processing for sites that allow it (e.g. Kleinanzeigen)
+                    for category, location in units:
+                        self.submit_pages(category, location, [1])
+                else:
+                    # Sensitive sites (e.g. Immoscout or Immowelt): the next location is only
+                    # opened once page 1 of the previous one is done
+                    self._pending_units = iter(units)
+                    self._pending_units_lock = threading.Lock()
+                    self.schedule_next_location()
+
+                self.scheduler.join(host=self.host)
+            completed = True
+        finally:
+            if self.work_queue is not None:
+                self.work_queue.close()
+            self.fetcher.close()
+            self.close_writer()
+            self.save_listing_index()
+            self.save_location_stats()
+            self.save_checkpoint(completed and not self.failed_writes)
+            self.log_summary(started)
+        self.raise_for_write_failures()
+
+    def schedule_next_location(self):
+        with self._pending_units_lock:
+            unit = next(self._pending_units, None)
+        if unit:
+            category, location = unit
+            self.submit_pages(category, location, [1])
+
+    def claim_next_location(self):
+        """Queues page 1 of the next location of the work queue; waits for one only if nothing else is running."""
+        unit = self.work_queue.claim()
+        if unit is None:
+            with self._open_pages_lock:
+                idle = not self._open_pages
+            if idle:
+                unit = self.work_queue.next_unit()
+        if unit:
+            category, location = unit
+            self.submit_pages(category, location, [1])
+
+    def submit_pages(self, category, location, pages: list[int], stale_pages: int = 0, front: bool = False):
+        with self._open_pages_lock:
+            self._open_pages[(category, location)] += len(pages)
+        self.scheduler.submit_many(
+            self.host,
+            [(self.process_page_task, category, location, page, stale_pages) for page in pages],
+            front=front,
+        )
+
+    def location_finished(self, category, location):
+        """Called once the last page of a location is done; records the visit in the location stats."""
+        with self._visits_lock:
+            visit = self._visits.pop((category, location), None)
+        # A visit without page 1 tells nothing about the location
+        if self.location_stats is not None and visit is not None and visit[2] is not None:
+            self.location_stats.record_visit(category, location, *visit)
 
-    def process_page_strategy(self, category, location, page) -> int:
+    def process_page_task(self, category, location, page, stale_pages=0):
+        """Scheduler task for one page; queues the follow-up pages of the location."""
+        try:
+            self.process_page(category, location, page, stale_pages)
+        finally:
+            # Sequential locations: page 1 opens the next location, even if processing it failed
+            if page == 1 and not self.CONCURRENT_LOCATIONS and self.work_queue is None:
+                self.schedule_next_location()
+            with self._open_pages_lock:
+                self._open_pages[(category, location)] -= 1
+                finished = self._open_pages[(category, location)] <= 0
+                if finished:
+                    del self._open_pages[(category, location)]
+            if finished:
+                self.location_finished(category, location)
+                if self.work_queue is not None:
+                    self.work_queue.complete(category, location)
+                    self.claim_next_location()
+
+    def process_page(self, category, location, page, stale_pages=0):
+        result = self.process_page_strategy(category, location, page)
+        pages_count = result.pages_count
+        self.record_page(category, location, page, result)
+
+        if self.incremental:
+            # Results are sorted newest first, so keep paging only while the
+            # last `stale_pages_limit` pages still brought new or changed listings
+            stale_pages = stale_pages + 1 if result.changed == 0 else 0
+            if page < pages_count and stale_pages < self.stale_pages_limit:
+                self.submit_pages(category, location, [page + 1], stale_pages, front=True)
+            elif page < pages_count:
+                self.logger.info(
+                    f"No new listings on the last {stale_pages} page(s) of {location}, "
+                    f"stopping at page {page} of {pages_count}"
+                )
+                self.stop_unit(category, location)
+        elif self.CONCURRENT_PAGES:
+            if page == 1 and pages_count > 1:
+                self.submit_pages(
+                    category, location, self.pages_to_fetch(category, location, range(2, pages_count + 1)), front=True
+                )
+        else:
+            next_page = next(iter(self.pages_to_fetch(category, location, range(page + 1, pages_count + 1))), None)
+            if next_page:
+                self.submit_pages(category, location, [next_page], front=True)
+
+    def process_page_strategy(self, category, location, page) -> PageResult:
         """
         Builds URL, fetches HTML, parses listings, saves to DB.
-        Returns total pages count.
+        Returns total pages count and listing counts.
         """
         url = self.build_url(category, location, page)
         
         try:
             # use the fetcher class to get the HTML.
             html = self.fetcher.fetch(url)
-            soup = BeautifulSoup(html, "lxml")
-            
-            # Get listings and save
-            listings = self.get_listings(soup)
-            # This is also saving "alternative" listings. To avoide this dont save them if pages_count is 1
+            return self.process_html(category, location, url, page, html)
+
+        except Exception as e:
+            self.logger.error(f"Failed page {page} for {location} (URL: {url}): {e}")
+            get_metrics().inc("page_failures_total", source=self.SOURCE.value)
+            return PageResult(failed=True)
+
+    def process_html(self, category, location, url: str, page: int, html: str) -> PageResult:
+        """Parses listings from a fetched page, saves them and returns the total pages count."""
+        result_page = ResultPage(html)
+        
+        # Get listings and save
+        listings = self.get_listings(result_page)
+        # This is also saving "alternative" listings. To avoide this dont save them if pages_count is 1
+        if self.listing_index is not None:
+            # Unchanged listings only need their last_seen_at refreshed
+            unchanged, changed_listings = [], []
+            for listing in listings:
+                (unchanged if self.listing_index.is_unchanged(listing) else changed_listings).append(listing)
+            changed = len(changed_listings)
+            if changed_listings:
+                self.save_listings(changed_listings, (category, location, page))
+            if unchanged:
+                self.touch_listings([listing.external_id for listing in unchanged], (category, location, page))
+        else:
+            # Must be counted before saving, which updates modified_at
+            changed = self.count_changed(listings) if self.incremental else len(listings)
             if listings:
-                self.db.set_new_listing_data(listings)
-            
-            # Get page count
-            pages_count = self.get_pages_count(soup)
-            
+                self.save_listings(listings, (category, location, page))
+        
+        # Get page count
+        pages_count = self.get_pages_count(result_page)
+
+        metrics = get_metrics()
+        metrics.inc("pages_total", source=self.SOURCE.value)
+        metrics.inc("listings_total", len(listings), source=self.SOURCE.value)
+        metrics.inc("listings_changed_total", changed, source=self.SOURCE.value)
+        if not listings:
+            metrics.inc("empty_pages_total", source=self.SOURCE.value)
+        
+        self.logger.info(
+            f"Listings: {len(listings):<3} \tChanged: {changed:<3} \tPage: {page} of {pages_count}"
+            # f"\tCategory {category} \tLocation {location}"
+            f"\tURL {url}"
+        )
+        return PageResult(pages_count, len(listings), changed)
+
+    def save_listings(self, listings: list[NewListing], page_key: tuple):
+        """
+        Stores the listings of the page `page_key` (category, location, page),
+        through the writer if there is one. The listing index only learns them
+        once they are written, until then they are pending.
+        """
+        if self.replaying:
+            # Known for the rest of the run, but old captures must not touch the live rows
+            self.listings_written(page_key, listings, None)
+        elif self.writer:
+            if self.listing_index is not None:
+                self.listing_index.add_pending(listings)
+            if self.checkpoint is not None:
+                self.checkpoint.write_queued(*page_key)
+            self.writer.put(listings, partial(self.listings_written, page_key, listings))
+        else:
+            self.db.set_new_listing_data(listings)
+            self.listings_written(page_key, listings, None)
+
+    def touch_listings(self, external_ids: list[str], page_key: tuple):
+        if self.replaying:
+            return
+        if self.writer:
+            if self.checkpoint is not None:
+                self.checkpoint.write_queued(*page_key)
+            self.writer.touch(self.SOURCE, external_ids, partial(self.listings_written, page_key, None))
+        else:
+            self.db.touch_listings(self.SOURCE, external_ids)
+
+    def listings_written(self, page_key: tuple, listings: list[NewListing] | None, error: Exception | None):
+        """
+        Outcome of a write of the page `page_key`. The listing index and the
+        checkpoint only learn a page once its listings are stored. A failed
+        write fails the page after the fact: it is counted, never marked done
+        in the checkpoint and the run ends with an error.
+        """
+        if listings and self.listing_index is not None:
+            if error is None:
+                self.listing_index.update(listings)
+            else:
+                self.listing_index.discard_pending(listings)
+        if error is None:
+            if self.checkpoint is not None:
+                self.checkpoint.page_written(*page_key)
+            return
+        category, location, page = page_key
+        self.logger.error(f"Listings of page {page} for {location} were not written: {error}")
+        if page_key in self.failed_writes:
+            return
+        self.failed_writes.add(page_key)
+        get_metrics().inc("page_failures_total", source=self.SOURCE.value)
+        if self.checkpoint is not None:
+            self.checkpoint.page_failed(category, location, page)
+
+    def raise_for_write_failures(self):
+        if self.failed_writes:
+            raise ListingWriteError(self.SOURCE.value, len(self.failed_writes))
+
+    def start_writer(self):
+        """Starts the write-behind stage, unless `database.writer.enabled` is false."""
+        if self.replaying:
+            self.logger.info("Replaying a page corpus, listings are not written to the DB")
+            return
+        writer_config = getattr(self.config.database, "writer", None)
+        if not getattr(writer_config, "enabled", True):
+            self.logger.info("Write-behind is off, pages write their listings themselves")
+            return
+        self.writer = ListingWriter(self.db)
+        self.writer.start()
+
+    def close_writer(self):
+        """Flushes the listings that are still queued."""
+        if self.writer:
+            self.writer.close()
+
+    def load_listing_index(self):
+        try:
+            self.listing_index = load_listing_index(self.db, self.SOURCE)
+        except Exception as e:
+            self.logger.warning(f"Could not load listing index, every listing takes the full write path: {e}")
+            self.listing_index = None
+
+    def save_listing_index(self):
+        if self.listing_index is None or self.replaying:
+            return
+        try:
+            self.listing_index.save(snapshot_path(self.SOURCE))
+        except Exception as e:
+            self.logger.warning(f"Could not save listing index snapshot: {e}")
+
+    def open_checkpoint(self):
+        if self.work_queue is not None or self.replaying:
+            # The work queue keeps the progress of a sharded crawl; a replay keeps none
+            return
+        try:
+            self.checkpoint = open_checkpoint(self.SOURCE, self.resume)
+        except Exception as e:
+            self.logger.warning(f"Could not open checkpoint, progress is not saved: {e}")
+            self.checkpoint = None
+
+    def save_checkpoint(self, completed: bool):
+        """Saves the progress; a completed run marks the checkpoint so it isn't resumed."""
+        if self.checkpoint is None:
+            return
+        try:
+            self.checkpoint.save(complete=completed)
+        except Exception as e:
+            self.logger.warning(f"Could not save checkpoint: {e}")
+
+    def unfinished_units(self, units: list[tuple]) -> list[tuple]:
+        """The (category, location) units the checkpoint has not finished yet."""
+        if self.checkpoint is None:
+            return units
+        unfinished = [unit for unit in units if not self.checkpoint.is_unit_done(*unit)]
+        if len(unfinished) < len(units):
+            self.logger.info(f"Skipping {len(units) - len(unfinished)} locations finished by the resumed run")
+        return unfinished
+
+    def pages_to_fetch(self, category, location, pages: range) -> list[int]:
+        """
+        `pages` without the ones the checkpoint has done. Page 1 of a location
+        is always fetched again, it has the current pages count.
+        """
+        if self.checkpoint is None:
+            return list(pages)
+        return [page for page in pages if not self.checkpoint.is_page_done(category, location, page)]
+
+    def record_page(self, category, location, page: int, result: PageResult):
+        if self.location_stats is not None:
+            with self._visits_lock:
+                visit = self._visits.setdefault((category, location), [0, 0, None])
+                visit[0] += result.changed
+                visit[1] += 1
+                if page == 1 and not result.failed:
+                    visit[2] = result.pages_count
+        if self.checkpoint is not None and not result.failed:
+            # Takes effect once the writer has stored the page's listings, see `listings_written`
+            self.checkpoint.page_done(category, location, page, result.pages_count)
+
+    def stop_unit(self, category, location):
+        if self.checkpoint is not None:
+            self.checkpoint.unit_done(category, location)
+
+    def load_location_stats(self):
+        if self.replaying:
+            # Replays every location of the corpus and records no yield
+            return
+        try:
+            self.location_stats = load_location_stats(self.SOURCE)
+        except Exception as e:
+            self.logger.warning(f"Could not load location stats, every location is visited: {e}")
+            self.location_stats = None
+
+    def save_location_stats(self):
+        if self.location_stats is None:
+            return
+        try:
+            self.location_stats.save()
+        except Exception as e:
+            self.logger.warning(f"Could not save location stats: {e}")
+
+    def plan_locations(self, units: list[tuple]) -> list[tuple]:
+        """
+        Orders the (category, location) units by expected new listings per
+        request and drops the ones that are not due or over the request budget
+        of the site (`find.<site>.request_budget`).
+        """
+        if self.location_stats is None:
+            return units
+        stats_config = getattr(self.config, "location_stats", None)
+        plan = self.location_stats.plan(
+            units,
+            budget=getattr(self.site_config, "request_budget", None),
+            min_expected=getattr(stats_config, "min_expected", 0.5),
+            max_interval_hours=getattr(stats_config, "max_interval_hours", 168),
+        )
+        self.logger.info(plan.summary(len(units)))
+        metrics = get_metrics()
+        metrics.inc("locations_skipped_total", plan.low_yield, source=self.SOURCE.value, reason="low_yield")
+        metrics.inc("locations_skipped_total", plan.over_budget, source=self.SOURCE.value, reason="budget")
+        return plan.units
+
+    def count_changed(self, listings: list[NewListing]) -> int:
+        """Number of listings that are not stored yet or were modified since they were stored."""
+        if not listings:
+            return 0
+        known = self.db.get_known_listings(self.SOURCE, [listing.external_id for listing in listings])
+        return sum(
+            1
+            for listing in listings
+            if listing.external_id not in known
+            or to_epoch(known[listing.external_id]) != to_epoch(listing.modified_at)
+        )
+
+    def log_summary(self, started: float):
+        self.logger.info(f"Run finished in {time.perf_counter() - started:.0f}s")
+        if self.scheduler and not self.shared_scheduler:
+            self.logger.info(self.scheduler.summary())
+        for line in self.fetcher.summary():
+            self.logger.info(line)
+        if self.checkpoint:
+            self.logger.info(self.checkpoint.summary())
+        if self.work_queue:
+            self.logger.info(self.work_queue.summary())
+        if self.writer:
+            self.logger.info(self.writer.summary())
+        self.logger.info(self.db.pool_summary())
+        if not self.shared_scheduler:
+            # A runner of several finders writes the metrics of the process once
+            self.write_metrics()
+
+    def write_metrics(self):
+        """Logs the slowest stages and writes the run's metrics as JSON and Prometheus text."""
+        metrics = get_metrics()
+        for line in metrics.summary()[:10]:
+            self.logger.info(line)
+        try:
+            path = metrics.write(self.SOURCE.value)
+        except Exception as e:
+            self.logger.warning(f"Could not write metrics: {e}")
+            return
+        if path:
+            self.logger.info(f"Metrics written to {path}.json / .prom")
+
+    # --- Async Engine ---
+
+    async def run_async(self):
+        """
+        Same strategy as `run`, but all requests are driven by one event loop.
+        At most `concurrency` requests are in flight; parsing and DB writes run
+        in a thread pool of `max_workers` so they don't block the loop.
+        """
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        await loop.run_in_executor(self._executor, self.load_listing_index)
+        self.load_location_stats()
+        self.open_checkpoint()
+        self.start_writer()
+        completed = False
+        try:
+            if self.work_queue is not None:
+                await self.run_work_queue_async()
+            else:
+                await self.crawl_categories_async()
+            completed = True
+        finally:
+            await self.fetcher.aclose()
+            self._executor.shutdown()
+            self.fetcher.close()
+            self.close_writer()
+            self.save_listing_index()
+            self.save_location_stats()
+            self.save_checkpoint(completed and not self.failed_writes)
+            self.log_summary(started)
+        self.raise_for_write_failures()
+
+    async def crawl_categories_async(self):
+        loop = asyncio.get_running_loop()
+        units = []
+        for category_name, category in self.get_categories():
+            locations = await loop.run_in_executor(self._executor, self.get_locations)
+
             self.logger.info(
-                f"Listings: {len(listings):<3} \tPage: {page} of {pages_count}"
-                # f"\tCategory {category} \tLocation {location}"
-                f"\tURL {url}"
+                f"Starting async crawl for {category_name} with {len(locations)} locations. "
+                f"Concurrency for locations: {'ON' if self.CONCURRENT_LOCATIONS else 'OFF'}. "
+                f"Requests in flight: {self.concurrency}."
+            )
+            units.extend((category, location) for location in locations)
+
+        units = self.plan_locations(self.unfinished_units(units))
+        if self.CONCURRENT_LOCATIONS:
+            await asyncio.gather(*(self.process_location_async(category, location) for category, location in units))
+        else:
+            for category, location in units:
+                await self.process_location_async(category, location)
+
+    async def run_work_queue_async(self):
+        """Sharded mode: `concurrency` (or one) coroutines crawl the locations claimed from the work queue."""
+        loop = asyncio.get_running_loop()
+        units = []
+        for _, category in self.get_categories():
+            locations = await loop.run_in_executor(self._executor, self.get_locations)
+            units.extend((category, location) for location in locations)
+        # Seeded in plan order, the queue hands out the most productive locations first
+        units = self.plan_locations(units)
+        await loop.run_in_executor(self._executor, self.work_queue.start, units)
+
+        async def crawl_claimed_locations():
+            # Waiting for a lease to expire blocks a thread, so not one of the parsing executor
+            while (unit := await loop.run_in_executor(None, self.work_queue.next_unit)) is not None:
+                await self.process_location_async(*unit)
+                await loop.run_in_executor(self._executor, self.work_queue.complete, *unit)
+
+        try:
+            await asyncio.gather(
+                *(crawl_claimed_locations() for _ in range(self.concurrency if self.CONCURRENT_LOCATIONS else 1))
+            )
+        finally:
+            self.work_queue.close()
+
+    async def process_location_async(self, category, location):
+        result = await self.process_page_async(category, location, page=1)
+        pages_count = result.pages_count
+
+        if self.incremental:
+            page, stale_pages = 1, int(result.changed == 0)
+            while page < pages_count and stale_pages < self.stale_pages_limit:
+                page += 1
+                result = await self.process_page_async(category, location, page)
+                stale_pages = stale_pages + 1 if result.changed == 0 else 0
+            if page < pages_count:
+                self.stop_unit(category, location)
+        elif pages_count > 1:
+            pages = self.pages_to_fetch(category, location, range(2, pages_count + 1))
+            if self.CONCURRENT_PAGES:
+                await asyncio.gather(*(self.process_page_async(category, location, page) for page in pages))
+            else:
+                for page in pages:
+                    await self.process_page_async(category, location, page)
+        self.location_finished(category, location)
+
+    async def process_page_async(self, category, location, page) -> PageResult:
+        url = self.build_url(category, location, page)
+
+        try:
+            async with self._semaphore:
+                html = await self.fetcher.fetch_async(url)
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._executor, self.process_html, category, location, url, page, html
             )
-            return pages_count
 
         except Exception as e:
             self.logger.error(f"Failed page {page} for {location} (URL: {url}): {e}")
-            return 0
+            result = PageResult(failed=True)
+        self.record_page(category, location, page, result)
+        return result
+
+    @classmethod
+    def main(cls, argv: list[str] | None = None):
+        """Command line entry point of the finder modules."""
+        parser = argparse.ArgumentParser(description=f"Run the {cls.__name__}.")
+        parser.add_argument(
+            "--async",
+            dest="use_async",
+            action="store_true",
+            help="run on the asyncio engine instead of thread pools",
+        )
+        parser.add_argument(
+            "--full-sweep",
+            action="store_true",
+            help="crawl every page even if incremental mode is configured",
+        )
+        corpus = parser.add_mutually_exclusive_group()
+        corpus.add_argument("--record", metavar="DIR", help="store every fetched page in an offline page corpus")
+        corpus.add_argument("--replay", metavar="DIR", help="serve pages from an offline page corpus instead of fetching")
+        progress = parser.add_mutually_exclusive_group()
+        progress.add_argument(
+            "--resume",
+            action="store_true",
+            help="continue the last run from its checkpoint if it was interrupted",
+        )
+        progress.add_argument(
+            "--shard",
+            metavar="CRAWL_ID",
+            help="share the crawl with every worker started with the same id, through the DB work queue",
+        )
+        parser.add_argument(
+            "--profile",
+            metavar="MODES",
+            help="profile the run: comma-separated cprofile, sampling, tracemalloc (or set FINDER_PROFILE)",
+        )
+        args = parser.parse_args(argv)
+
+        finder = cls()
+        if args.full_sweep:
+            finder.incremental = False
+        finder.resume = args.resume
+        if args.record:
+            finder.fetcher.use_corpus("record", args.record)
+        elif args.replay:
+            finder.fetcher.use_corpus("replay", args.replay)
+        if args.shard:
+            if finder.replaying:
+                parser.error("a replay can't take part in a sharded crawl, it must not change the DB work queue")
+            finder.work_queue = WorkQueue(finder.SOURCE, args.shard)
+        with profile_run(finder.SOURCE.value, finder, args.profile):
+            if args.use_async:
+                asyncio.run(finder.run_async())
+            else:
+                finder.run()
 
     # --- Abstract Methods ---
 
@@ -119,9 +722,9 @@ class BaseFinder(ABC):
         pass
 
     @abstractmethod
-    def get_listings(self, soup: BeautifulSoup) -> list:
+    def get_listings(self, page: ResultPage) -> list:
         pass
 
     @abstractmethod
-    def get_pages_count(self, soup: BeautifulSoup) -> int:
+    def get_pages_count(self, page: ResultPage) -> int:
         pass
\ No newline at end of file
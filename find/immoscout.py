@@ -3,8 +3,11 @@ from datetime import datetime
 from typing import Any
 from bs4 import BeautifulSoup, Tag
 from lib.config import get_config, get_env
+from lib.metrics import get_metrics
+from lib.extract import ResultPage, immoscout_pages_count, immoscout_result_list
 from lib.models import IMMOSCOUT_SEARCH_CATEGORIES, ListingSource, NewListing
 from lib.exceptions import ElementNotFoundError, NotBeautifulSoupError
+from lib.fetch.fetcher import FetchPools
 from .base import BaseFinder
 
 config = get_config()
@@ -28,12 +31,13 @@ def extract_listing_data(listing: dict[str, Any]) -> NewListing:
 class ImmoscoutFinder(BaseFinder):
     CONCURRENT_LOCATIONS = False
     BASE_URL = "https://www.immobilienscout24.de/Suche/shape"
+    SOURCE = ListingSource.IMMOBILIENSCOUT24
 
-    def __init__(self):
+    def __init__(self, pools: FetchPools | None = None):
         method = config.find.immoscout.method
         use_proxy = config.find.immoscout.use_proxy
         proxy_url = getattr(get_env(), "PROXY_URL__IMMOSCOUT", None) if use_proxy else None
-        super().__init__(method=method, proxy_url=proxy_url)
+        super().__init__(method=method, proxy_url=proxy_url, pools=pools)
 
     def get_categories(self):
         return IMMOSCOUT_SEARCH_CATEGORIES.items()
@@ -47,7 +51,17 @@ class ImmoscoutFinder(BaseFinder):
             url += f"&pagenumber={page}"
         return url
 
-    def get_json_data(self, soup: BeautifulSoup) -> dict[str, Any]:
+    def get_json_data(self, page: ResultPage) -> dict[str, Any]:
+        with get_metrics().timer("json_extract_seconds", source=self.SOURCE.value):
+            json_data = immoscout_result_list(page.html)
+            if json_data is not None:
+                try:
+                    return json.loads(json_data)
+                except json.JSONDecodeError as e:
+                    self.logger.debug(f"Fast resultListModel extraction failed, falling back to BeautifulSoup: {e}")
+            return self.get_json_data_from_soup(page.soup)
+
+    def get_json_data_from_soup(self, soup: BeautifulSoup) -> dict[str, Any]:
         json_script_tag = soup.find("script", string=lambda text: text is not None and "IS24.resultList" in text)  # type: ignore
 
         if json_script_tag is None:
@@ -66,8 +80,8 @@ class ImmoscoutFinder(BaseFinder):
 
         return json.loads(json_data)
 
-    def get_listings(self, soup: BeautifulSoup) -> list[NewListing]:
-        json_data = self.get_json_data(soup)
+    def get_listings(self, page: ResultPage) -> list[NewListing]:
+        json_data = self.get_json_data(page)
         result_list = json_data["searchResponseModel"]["resultlist.resultlist"]["resultlistEntries"][0]
         if "resultlistEntry" not in result_list:
             self.logger.warning("No listings found on this page, skipping")
@@ -89,7 +103,13 @@ class ImmoscoutFinder(BaseFinder):
                     listings.append(extract_listing_data(similar_entry))
         return listings
 
-    def get_pages_count(self, soup: BeautifulSoup) -> int:
+    def get_pages_count(self, page: ResultPage) -> int:
+        pages_count = immoscout_pages_count(page.html)
+        if pages_count is not None:
+            return pages_count
+        return self.get_pages_count_from_soup(page.soup)
+
+    def get_pages_count_from_soup(self, soup: BeautifulSoup) -> int:
         pagination_buttons = soup.find_all(attrs={"data-testid": "pagination-button"})
         if len(pagination_buttons) < 2:
             self.logger.warning("No pagination buttons found, assuming only one page")
@@ -99,5 +119,4 @@ class ImmoscoutFinder(BaseFinder):
 
 # --- Entry Point ---
 if __name__ == "__main__":
-    finder = ImmoscoutFinder()
-    finder.run()
\ No newline at end of file
+    ImmoscoutFinder.main()
\ No newline at end of file
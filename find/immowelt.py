@@ -3,30 +3,32 @@ from datetime import datetime
 from typing import Any
 
 from bs4 import BeautifulSoup, Tag
-from lzstring import LZString
 
 from lib.logger import get_logger
+from lib.lzstring import decompress_from_base64
+from lib.metrics import get_metrics
 from lib.config import get_config, get_env
+from lib.extract import ResultPage, immowelt_pages_count, immowelt_serp_data
 from lib.exceptions import ElementNotFoundError, NotBeautifulSoupError
 from lib.models import IMMOWELT_SEARCH_CATEGORIES, ListingSource, NewListing
+from lib.fetch.fetcher import FetchPools
 from .base import BaseFinder
 
 config = get_config()
 logger = get_logger("immowelt")
 
-lz = LZString()
-
 
 class ImmoweltFinder(BaseFinder):
     CONCURRENT_LOCATIONS = False
     BASE_URL = "https://www.immowelt.de/classified-search"
+    SOURCE = ListingSource.IMMOWELT
 
 
-    def __init__(self):
+    def __init__(self, pools: FetchPools | None = None):
         method = config.find.immowelt.method
         use_proxy = config.find.immowelt.use_proxy
         proxy_url = getattr(get_env(), "PROXY_URL__IMMOWELT", None) if use_proxy else None
-        super().__init__(method=method, proxy_url=proxy_url)
+        super().__init__(method=method, proxy_url=proxy_url, pools=pools)
 
     def get_categories(self):
         return IMMOWELT_SEARCH_CATEGORIES.items()
@@ -41,7 +43,19 @@ class ImmoweltFinder(BaseFinder):
         return url
 
 
-    def get_json_data(self, soup: BeautifulSoup) -> dict[str, Any]:
+    def get_json_data(self, page: ResultPage) -> dict[str, Any]:
+        with get_metrics().timer("json_extract_seconds", source=self.SOURCE.value):
+            encoded = immowelt_serp_data(page.html)
+            if encoded is not None:
+                decoded = decompress_from_base64(encoded)
+                if decoded:
+                    try:
+                        return json.loads(decoded)
+                    except json.JSONDecodeError as e:
+                        self.logger.debug(f"Fast classified-serp-init-data extraction failed, falling back to BeautifulSoup: {e}")
+            return self.get_json_data_from_soup(page.soup)
+
+    def get_json_data_from_soup(self, soup: BeautifulSoup) -> dict[str, Any]:
         script_tag = soup.find("script", string=lambda text: text is not None and "__UFRN_FETCHER__" in text)  # type: ignore
         if not script_tag:
             # log the first 1000 characters of the page HTML for debugging
@@ -52,13 +66,13 @@ class ImmoweltFinder(BaseFinder):
         if "classified-serp-init-data" not in str(script_tag):
             raise ValueError(f"classified-serp-init-data not found in script tag: {script_tag}")
         encoded = str(script_tag).split(r"\"classified-serp-init-data\":\"")[1].split('"}')[0]
-        decoded = lz.decompressFromBase64(encoded)
+        decoded = decompress_from_base64(encoded)
         if not decoded:
             raise ValueError("Failed to decode JSON data from the script tag.")
         return json.loads(decoded)
 
-    def get_listings(self, soup: BeautifulSoup) -> list[NewListing]:
-        json_data = self.get_json_data(soup)
+    def get_listings(self, page: ResultPage) -> list[NewListing]:
+        json_data = self.get_json_data(page)
         result_entries: dict[str, dict[str, Any]] = json_data.get("pageProps", {}).get("classifiedsData", {})
         listings: list[NewListing] = []
         for entry in result_entries.values():
@@ -67,7 +81,13 @@ class ImmoweltFinder(BaseFinder):
             listings.append(extract_listing_data(entry["metadata"]))
         return listings
 
-    def get_pages_count(self, soup: BeautifulSoup) -> int:
+    def get_pages_count(self, page: ResultPage) -> int:
+        pages_count = immowelt_pages_count(page.html)
+        if pages_count is not None:
+            return pages_count
+        return self.get_pages_count_from_soup(page.soup)
+
+    def get_pages_count_from_soup(self, soup: BeautifulSoup) -> int:
         pagination_buttons_container = soup.find("nav", attrs={"data-testid": "serp-pagination-testid"})
         if not pagination_buttons_container:
             raise ElementNotFoundError("Pagination buttons container")
@@ -100,5 +120,4 @@ def extract_listing_data(listing: dict[str, str]) -> NewListing:
 
 
 if __name__ == "__main__":
-    finder = ImmoweltFinder()
-    finder.run()
+    ImmoweltFinder.main()
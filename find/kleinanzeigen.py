@@ -1,8 +1,10 @@
-from bs4 import BeautifulSoup, Tag
 from lib.config import get_config, get_env
 from lib.database import Database
+from lib.extract import ResultPage, kleinanzeigen_ad_ids, kleinanzeigen_summary
+from lib.location_snapshot import load_kleinanzeigen_ids
 from lib.models import KLEINANZEIGEN_SEARCH_CATEGORIES, ListingSource, NewListing
-from lib.exceptions import ElementNotFoundError, NotBeautifulSoupError
+from lib.exceptions import ElementNotFoundError
+from lib.fetch.fetcher import FetchPools
 from .base import BaseFinder
 
 config = get_config()
@@ -11,24 +13,27 @@ class KleinanzeigenFinder(BaseFinder):
     LISTINGS_PER_PAGE = 25
     CONCURRENT_LOCATIONS = True
     BASE_URL = "https://www.kleinanzeigen.de/"
+    SOURCE = ListingSource.KLEINANZEIGEN
 
-    def __init__(self):
+    def __init__(self, pools: FetchPools | None = None):
         method = config.find.kleinanzeigen.method
         use_proxy = config.find.kleinanzeigen.use_proxy
         proxy_url = getattr(get_env(), "PROXY_URL__KLEINANZEIGEN", None) if use_proxy else None
-        super().__init__(method=method, proxy_url=proxy_url)
+        super().__init__(method=method, proxy_url=proxy_url, pools=pools)
+        self._locations: list | None = None
 
     def get_categories(self):
         return KLEINANZEIGEN_SEARCH_CATEGORIES.items()
 
     def get_locations(self):
-        ids_from_config = set(self.config.finder.locations.kleinanzeigen.ids)
-        ids_from_states = {
-            kid 
-            for state in self.config.finder.locations.kleinanzeigen.states 
-            for kid in self.db.get_kleinanzeigen_ids_by_state(state)
-        }
-        return list(ids_from_config | ids_from_states)
+        # Called once per category, the ids are resolved once per run
+        if self._locations is None:
+            locations_config = self.config.finder.locations.kleinanzeigen
+            max_age = getattr(locations_config, "snapshot_max_age_hours", 168) * 3600
+            ids_from_config = set(locations_config.ids)
+            ids_from_states = set(load_kleinanzeigen_ids(self.db, locations_config.states, max_age))
+            self._locations = sorted(ids_from_config | ids_from_states, key=str)
+        return self._locations
 
     def build_url(self, category_id, location, page):
         page_path = f"seite:{page}/" if page > 1 else ""
@@ -38,42 +43,38 @@ class KleinanzeigenFinder(BaseFinder):
     # def fetch_html(self, url: str) -> str:
     #     return self.fetcher.fetch(url)
 
-    def get_listings(self, soup: BeautifulSoup) -> list[NewListing]:
-        entries_list = soup.find("ul", attrs={"id": "srchrslt-adtable"})
+    def get_listings(self, page: ResultPage) -> list[NewListing]:
+        external_ids = kleinanzeigen_ad_ids(page.tree)
 
-        if not entries_list:
+        if external_ids is None:
             return []
-        if type(entries_list) != Tag:
-            raise NotBeautifulSoupError("entries_list")
 
         listings: list[NewListing] = []
+        seen: set[str] = set()
 
-        for entry in entries_list.find_all("article", attrs={"data-adid": True}):
-            external_id = entry.get("data-adid")
+        for external_id in external_ids:
             if not external_id:
-                self.logger.warning(f"No data-adid found in entry: {entry}")
+                self.logger.warning("Empty data-adid found in result list, skipping entry")
                 continue
-            listing = NewListing(external_id=external_id, source=ListingSource.KLEINANZEIGEN)
 
-            if listing.external_id in [l.external_id for l in listings]:
-                self.logger.debug(f"Duplicate listing found, skipping: {listing.external_id}")
+            if external_id in seen:
+                self.logger.debug(f"Duplicate listing found, skipping: {external_id}")
                 continue
 
-            listings.append(listing)
+            seen.add(external_id)
+            listings.append(NewListing(external_id=external_id, source=ListingSource.KLEINANZEIGEN))
 
         return listings
 
-    def get_pages_count(self, soup: BeautifulSoup) -> int:
-        total_listings_tag = soup.find("span", class_="breadcrump-summary")
+    def get_pages_count(self, page: ResultPage) -> int:
+        summary_texts = kleinanzeigen_summary(page.tree)
 
-        if not total_listings_tag:
+        if summary_texts is None:
             raise ElementNotFoundError("span.breadcrump-summary")
-        if type(total_listings_tag) != Tag:
-            raise NotBeautifulSoupError("total_listings_tag")
-        if "Es wurden keine" in total_listings_tag.get_text():
+        if "Es wurden keine" in "".join(summary_texts):
             return 0
 
-        total_listings_text = total_listings_tag.get_text(strip=True)
+        total_listings_text = "".join(text.strip() for text in summary_texts)
         if not total_listings_text:
             raise ValueError("Total listings text is empty")
 
@@ -101,5 +102,4 @@ class KleinanzeigenFinder(BaseFinder):
 
 # --- Entry Point ---
 if __name__ == "__main__":
-    finder = KleinanzeigenFinder()
-    finder.run()
+    KleinanzeigenFinder.main()
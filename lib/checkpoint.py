@@ -0,0 +1,226 @@
+import json
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from lib.config import BASE_DIR, get_config
+from lib.logger import get_logger
+from lib.models import ListingSource
+
+config = get_config()
+logger = get_logger("checkpoint")
+
+
+class Checkpoint:
+    """
+    Crawl progress of a run: the pages count and the finished pages of every
+    (category, location), saved to a local JSON file every `interval` seconds
+    and at the end of the run.
+
+    A resumed run skips the locations that were finished and the finished
+    pages of the others. A run that ends normally marks the file complete, so
+    the next run starts from the beginning again.
+    """
+
+    def __init__(self, path: Path, interval: float = 60):
+        self.path = path
+        self.interval = interval
+        self.started_at = time.time()
+        self.complete = False
+        # category -> location -> {"pages_count": int | None, "done": [pages], "finished": bool}
+        self._units: dict[str, dict[str, dict]] = {}
+        self._lock = threading.Lock()
+        self._saved_at = time.monotonic()
+        # (category, location) -> pages of this run whose listings could not be written
+        self._failed: dict[tuple[str, str], set[int]] = {}
+        # (category, location, page) -> writes of the page still queued in the writer
+        self._writes: dict[tuple[str, str, int], int] = {}
+        # Parsed pages that are done once their queued writes are stored
+        self._parsed: set[tuple[str, str, int]] = set()
+        # Locations stopped by `unit_done` that are finished once their pages are written
+        self._stopped: set[tuple[str, str]] = set()
+
+    def _unit(self, category, location) -> dict:
+        return self._units.setdefault(str(category), {}).setdefault(
+            str(location), {"pages_count": None, "done": [], "finished": False}
+        )
+
+    def _get(self, category, location) -> dict | None:
+        return self._units.get(str(category), {}).get(str(location))
+
+    # --- Progress ---
+
+    def write_queued(self, category, location, page: int):
+        """
+        A write of the page's listings was handed to the write-behind writer.
+        The page is only done once every queued write of it is stored
+        (`page_written`), so a resumed run never skips a page whose listings
+        were still in the writer's queue.
+        """
+        with self._lock:
+            key = (str(category), str(location), page)
+            self._writes[key] = self._writes.get(key, 0) + 1
+
+    def page_written(self, category, location, page: int):
+        with self._lock:
+            key = (str(category), str(location), page)
+            if key not in self._writes:
+                return
+            self._writes[key] -= 1
+            if self._writes[key] > 0:
+                return
+            del self._writes[key]
+            if key in self._parsed:
+                self._parsed.discard(key)
+                self._mark_done(category, location, page)
+            due = time.monotonic() - self._saved_at >= self.interval
+        if due:
+            self._save_periodically()
+
+    def page_done(self, category, location, page: int, pages_count: int):
+        """The page is parsed; it is marked done now, or once its queued writes are stored."""
+        with self._lock:
+            unit = self._unit(category, location)
+            if page == 1 or unit["pages_count"] is None:
+                unit["pages_count"] = pages_count
+            key = (str(category), str(location), page)
+            if key in self._writes:
+                self._parsed.add(key)
+            else:
+                self._mark_done(category, location, page)
+            due = time.monotonic() - self._saved_at >= self.interval
+        if due:
+            self._save_periodically()
+
+    def _mark_done(self, category, location, page: int):
+        unit_key = (str(category), str(location))
+        if page in self._failed.get(unit_key, ()):
+            return
+        unit = self._unit(category, location)
+        if page not in unit["done"]:
+            unit["done"].append(page)
+        if len(unit["done"]) >= max(unit["pages_count"], 1):
+            unit["finished"] = True
+        elif unit_key in self._stopped and not self._has_writes(unit_key):
+            self._stopped.discard(unit_key)
+            unit["finished"] = True
+
+    def _has_writes(self, unit_key: tuple[str, str]) -> bool:
+        return any(key[:2] == unit_key for key in self._writes)
+
+    def _save_periodically(self):
+        # Runs inside a page task or the writer, a full disk must not fail them
+        try:
+            self.save()
+        except Exception as e:
+            logger.warning(f"Could not save checkpoint: {e}")
+
+    def page_failed(self, category, location, page: int):
+        """
+        A page whose listings could not be written: it is never marked done, so
+        a resumed run fetches it again. It may be called before or after `page_done`.
+        """
+        with self._lock:
+            unit_key = (str(category), str(location))
+            self._failed.setdefault(unit_key, set()).add(page)
+            self._writes.pop((*unit_key, page), None)
+            self._parsed.discard((*unit_key, page))
+            self._stopped.discard(unit_key)
+            unit = self._unit(category, location)
+            if page in unit["done"]:
+                unit["done"].remove(page)
+            unit["finished"] = False
+
+    def unit_done(self, category, location):
+        """
+        Marks a location finished before its last page, e.g. when incremental
+        mode stops paging; once the queued writes of its pages are stored.
+        """
+        with self._lock:
+            unit_key = (str(category), str(location))
+            if unit_key in self._failed:
+                return
+            if self._has_writes(unit_key):
+                self._stopped.add(unit_key)
+            else:
+                self._unit(category, location)["finished"] = True
+
+    def is_unit_done(self, category, location) -> bool:
+        with self._lock:
+            unit = self._get(category, location)
+            return unit is not None and unit["finished"]
+
+    def is_page_done(self, category, location, page: int) -> bool:
+        with self._lock:
+            unit = self._get(category, location)
+            return unit is not None and page in unit["done"]
+
+    def summary(self) -> str:
+        with self._lock:
+            units = [unit for locations in self._units.values() for unit in locations.values()]
+        finished = sum(unit["finished"] for unit in units)
+        pages = sum(len(unit["done"]) for unit in units)
+        return f"Checkpoint {self.path.name}: {finished} of {len(units)} locations finished, {pages} pages done"
+
+    # --- File ---
+
+    def save(self, complete: bool = False):
+        with self._lock:
+            self.complete = self.complete or complete
+            data = json.dumps(
+                {"started_at": self.started_at, "saved_at": time.time(), "complete": self.complete, "units": self._units}
+            )
+            self._saved_at = time.monotonic()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(data, encoding="utf-8")
+        tmp_path.replace(self.path)
+
+    @classmethod
+    def load(cls, path: Path, max_age: float, interval: float = 60) -> "Checkpoint | None":
+        """The checkpoint of an interrupted run at `path`, or None if there is none younger than `max_age` seconds."""
+        if not path.exists():
+            return None
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data["complete"]:
+            logger.info(f"Ignoring checkpoint {path}: the run was completed")
+            return None
+        if time.time() - data["saved_at"] > max_age:
+            logger.info(f"Ignoring checkpoint {path}: older than {max_age / 3600:.0f}h")
+            return None
+        checkpoint = cls(path, interval)
+        checkpoint.started_at = data["started_at"]
+        checkpoint._units = data["units"]
+        return checkpoint
+
+
+def _checkpoint_config():
+    return getattr(config, "checkpoint", SimpleNamespace())
+
+
+def checkpoint_path(source: ListingSource) -> Path:
+    checkpoint_dir = getattr(_checkpoint_config(), "dir", "cache")
+    return BASE_DIR / checkpoint_dir / f"checkpoint_{source.value}.json"
+
+
+def open_checkpoint(source: ListingSource, resume: bool) -> Checkpoint | None:
+    """
+    The checkpoint for a run of `source`: with `resume` the one an interrupted
+    run left behind (if younger than `checkpoint.max_age_hours`), otherwise a
+    new one. Returns None if checkpoints are disabled in the config.
+    """
+    checkpoint_config = _checkpoint_config()
+    if not getattr(checkpoint_config, "enabled", True):
+        return None
+
+    path = checkpoint_path(source)
+    interval = getattr(checkpoint_config, "interval_seconds", 60)
+    if resume:
+        max_age = getattr(checkpoint_config, "max_age_hours", 24) * 3600
+        checkpoint = Checkpoint.load(path, max_age, interval)
+        if checkpoint is not None:
+            logger.info(f"Resuming from {checkpoint.summary()}")
+            return checkpoint
+        logger.info("No checkpoint to resume from, starting from the beginning")
+    return Checkpoint(path, interval)
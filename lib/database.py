@@ -1,12 +1,20 @@
+import atexit
+import threading
 import time
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
+from types import SimpleNamespace
+from typing import Iterator
 import psycopg
-from psycopg.sql import SQL, Placeholder, Composed, Identifier
+from psycopg_pool import ConnectionPool
+from psycopg.sql import SQL, Placeholder, Identifier
+from psycopg.types.json import Jsonb
 from lib.config import get_config, get_env
-from lib.models import NewListing
+from lib.models import ListingSource, NewListing
 from datetime import datetime
 import zoneinfo
 from lib.logger import get_logger
+from lib.helpers import as_berlin
+from lib.metrics import get_metrics
 
 berlin_tz = zoneinfo.ZoneInfo("Europe/Berlin")
 
@@ -14,120 +22,251 @@ config = get_config()
 env = get_env()
 
 
-GET_KLEINANZEIGEN_IDS_BY_STATE_SQL = SQL(
+GET_KLEINANZEIGEN_IDS_BY_STATES_SQL = SQL(
     """
     SELECT DISTINCT f.kleinanzeigen_location_id
     FROM germany.custom f
     JOIN germany.zuordnung_plz_ags z ON f.plz = z.plz
-    WHERE z.bundesland = {state}
+    WHERE z.bundesland = ANY({states})
     """
-).format(state=Placeholder("state"))
+).format(states=Placeholder("states"))
 
-SET_NEW_LISTING_DATA_SQL: Composed = SQL(
-    "INSERT INTO {schema}.{table} ({fields}) VALUES ({values}) " "ON CONFLICT ({conflict}) DO UPDATE SET {updates}"
-).format(
-    schema=Identifier("fixnflip_v2"),
-    table=Identifier("property"),
-    fields=SQL(", ").join(
-        [
-            Identifier("source"),
-            Identifier("external_id"),
-            Identifier("modified_at"),
-            Identifier("created_at"),
-        ]
-    ),
-    values=SQL(", ").join(
-        [
-            Placeholder("source"),
-            Placeholder("external_id"),
-            Placeholder("modified_at"),
-            Placeholder("created_at"),
-        ]
-    ),
-    conflict=SQL(", ").join([Identifier("external_id"), Identifier("source")]),
-    updates=SQL("{0} = EXCLUDED.{0}").format(Identifier("modified_at")),
-)
+GET_KNOWN_LISTINGS_SQL = SQL(
+    """
+    SELECT external_id, modified_at
+    FROM {schema}.{table}
+    WHERE source::text = %(source)s AND external_id = ANY(%(external_ids)s)
+    """
+).format(schema=Identifier("fixnflip_v2"), table=Identifier("property"))
 
-SELECT_PROPERTY_IDS_SQL = SQL(
+STREAM_LISTING_MODIFIED_AT_SQL = SQL(
     """
-    SELECT id, external_id 
-    FROM {schema}.{table} 
-    WHERE (external_id, source::text) IN (SELECT unnest(%(external_ids)s::text[]), unnest(%(sources)s::text[]))
+    SELECT external_id, modified_at
+    FROM {schema}.{table}
+    WHERE source::text = %(source)s
     """
 ).format(schema=Identifier("fixnflip_v2"), table=Identifier("property"))
 
-GENERAL_INSERT_SQL: Composed = SQL(
-    # Dont update active status to True on conflicts since this will be handled by scraper and not finder
-    "INSERT INTO {schema}.{table} ({fields}) VALUES ({values}) ON CONFLICT ({conflict}) DO NOTHING"
-    # "INSERT INTO {schema}.{table} ({fields}) VALUES ({values}) ON CONFLICT ({conflict}) DO UPDATE SET active = EXCLUDED.active"
-).format(
-    schema=Identifier("fixnflip_v2"),
-    table=Identifier("general"),
-    fields=SQL(", ").join([Identifier("property_id"), Identifier("active")]),
-    values=SQL(", ").join([Placeholder("property_id"), Placeholder("active")]),
-    conflict=Identifier("property_id"),
-)
+TOUCH_LISTINGS_SQL = SQL(
+    """
+    UPDATE {schema}.{system} s
+    SET last_seen_at = %(last_seen_at)s
+    FROM {schema}.{property} p
+    WHERE p.id = s.property_id AND p.source::text = %(source)s AND p.external_id = ANY(%(external_ids)s)
+    """
+).format(schema=Identifier("fixnflip_v2"), system=Identifier("system"), property=Identifier("property"))
 
-SYSTEM_INSERT_SQL: Composed = SQL(
-    "INSERT INTO {schema}.{table} ({fields}) VALUES ({values}) " "ON CONFLICT ({conflict}) DO UPDATE SET {updates}"
+# The input rows take the column types of property (source is an enum), like
+# the staging table of bulk_upsert_listings
+UPSERT_LISTINGS_SQL = SQL(
+    """
+    WITH input AS (
+        SELECT DISTINCT ON (source, external_id) source, external_id, modified_at, created_at
+        FROM jsonb_populate_recordset(NULL::{schema}.{property}, %(listings)s)
+        ORDER BY source, external_id, modified_at DESC NULLS LAST
+    ),
+    upserted AS (
+        INSERT INTO {schema}.{property} (source, external_id, modified_at, created_at)
+        SELECT source, external_id, modified_at, created_at FROM input
+        ON CONFLICT (external_id, source) DO UPDATE SET modified_at = EXCLUDED.modified_at
+        RETURNING id
+    ),
+    general_rows AS (
+        -- Dont update active status to True on conflicts since this will be handled by scraper and not finder
+        INSERT INTO {schema}.{general} (property_id, active)
+        SELECT id, TRUE FROM upserted
+        ON CONFLICT (property_id) DO NOTHING
+    )
+    INSERT INTO {schema}.{system} (property_id, last_seen_at)
+    SELECT id, %(last_seen_at)s::timestamptz FROM upserted
+    ON CONFLICT (property_id) DO UPDATE SET last_seen_at = EXCLUDED.last_seen_at
+    """
 ).format(
     schema=Identifier("fixnflip_v2"),
-    table=Identifier("system"),
-    fields=SQL(", ").join([Identifier("property_id"), Identifier("last_seen_at")]),
-    values=SQL(", ").join([Placeholder("property_id"), Placeholder("last_seen_at")]),
-    conflict=Identifier("property_id"),
-    updates=SQL("{0} = EXCLUDED.{0}").format(Identifier("last_seen_at")),
+    property=Identifier("property"),
+    general=Identifier("general"),
+    system=Identifier("system"),
 )
 
+# Write-behind path (lib.writer): COPY a batch into a staging table, then merge it set-based
+CREATE_LISTING_STAGING_SQL = SQL(
+    """
+    CREATE TEMP TABLE listing_staging ON COMMIT DROP AS
+    SELECT source, external_id, modified_at, created_at FROM {schema}.{table} WITH NO DATA
+    """
+).format(schema=Identifier("fixnflip_v2"), table=Identifier("property"))
+
+COPY_LISTING_STAGING_SQL = SQL("COPY listing_staging (source, external_id, modified_at, created_at) FROM STDIN")
+
+MERGE_STAGING_PROPERTY_SQL = SQL(
+    """
+    INSERT INTO {schema}.{table} (source, external_id, modified_at, created_at)
+    SELECT DISTINCT ON (source, external_id) source, external_id, modified_at, created_at
+    FROM listing_staging
+    ORDER BY source, external_id, modified_at DESC NULLS LAST
+    ON CONFLICT (external_id, source) DO UPDATE SET modified_at = EXCLUDED.modified_at
+    """
+).format(schema=Identifier("fixnflip_v2"), table=Identifier("property"))
+
+MERGE_STAGING_GENERAL_SQL = SQL(
+    """
+    INSERT INTO {schema}.{general} (property_id, active)
+    SELECT DISTINCT p.id, TRUE
+    FROM listing_staging s
+    JOIN {schema}.{property} p ON p.external_id = s.external_id AND p.source = s.source
+    ON CONFLICT (property_id) DO NOTHING
+    """
+).format(schema=Identifier("fixnflip_v2"), general=Identifier("general"), property=Identifier("property"))
+
+MERGE_STAGING_SYSTEM_SQL = SQL(
+    """
+    INSERT INTO {schema}.{system} (property_id, last_seen_at)
+    SELECT DISTINCT p.id, %(last_seen_at)s::timestamptz
+    FROM listing_staging s
+    JOIN {schema}.{property} p ON p.external_id = s.external_id AND p.source = s.source
+    ON CONFLICT (property_id) DO UPDATE SET last_seen_at = EXCLUDED.last_seen_at
+    """
+).format(schema=Identifier("fixnflip_v2"), system=Identifier("system"), property=Identifier("property"))
+
 def db_operation_with_retry(func):
     def wrapper(self, *args, **kwargs):
         attempts = config.database.max_retries
         delay = config.database.retry_delay
+        metrics = get_metrics()
         for attempt in range(1, attempts + 1):
             try:
-                return func(self, *args, **kwargs)
+                with metrics.timer("db_seconds", operation=func.__name__):
+                    return func(self, *args, **kwargs)
             except Exception as exc:
                 self.logger.warning(f"DB operation failed (attempt {attempt}/{attempts}): {exc}")
+                metrics.inc("db_failures_total", operation=func.__name__)
                 if attempt == attempts:
                     raise
+                metrics.inc("retries_total", backend="database")
+                if isinstance(exc, psycopg.OperationalError):
+                    # Drop idle connections that broke together with this one
+                    self._pool.check()
                 time.sleep(delay)
     return wrapper
 
 
-class Database:
+class _WaitStats:
+    """Time spent waiting for a pooled connection, to size the pool."""
+
     def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+_pool_waits = _WaitStats()
+_PIPELINE_SUPPORTED = psycopg.Pipeline.is_supported()
+
+
+def get_pool() -> ConnectionPool:
+    """
+    The connection pool shared by every Database instance of the process,
+    configured by the optional `database.pool` block.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            pool_config = getattr(config.database, "pool", SimpleNamespace())
+            _pool = ConnectionPool(
+                kwargs={
+                    "host": env.DATABASE__HOST,
+                    "port": int(env.DATABASE__PORT),
+                    "dbname": env.DATABASE__NAME,
+                    "user": env.DATABASE__USER,
+                    "password": env.DATABASE__PASSWORD,
+                    "connect_timeout": config.database.timeout,
+                    "row_factory": psycopg.rows.dict_row,
+                },
+                min_size=getattr(pool_config, "min_size", 1),
+                max_size=getattr(pool_config, "max_size", 10),
+                max_lifetime=getattr(pool_config, "max_lifetime", 3600),
+                max_idle=getattr(pool_config, "max_idle", 600),
+                timeout=getattr(pool_config, "timeout", 30),
+                check=ConnectionPool.check_connection if getattr(pool_config, "check", True) else None,
+                name="database",
+                open=True,
+            )
+            atexit.register(_pool.close)
+        return _pool
+
+
+class Database:
+    def __init__(self, pool: ConnectionPool | None = None):
         self.logger = get_logger(self.__class__.__name__)
-        self._conn_kwargs = {
-            "host": env.DATABASE__HOST,
-            "port": int(env.DATABASE__PORT),
-            "dbname": env.DATABASE__NAME,
-            "user": env.DATABASE__USER,
-            "password": env.DATABASE__PASSWORD,
-            "connect_timeout": config.database.timeout,
-        }
+        self._pool = pool or get_pool()
 
     @contextmanager
     def _db(self):
-        conn = psycopg.connect(**self._conn_kwargs, row_factory=psycopg.rows.dict_row)
-        try:
+        start = time.perf_counter()
+        # Broken connections are discarded by the pool when they are returned
+        with self._pool.connection() as conn:
+            _pool_waits.add(time.perf_counter() - start)
             with conn.cursor() as cursor:
                 yield conn, cursor
-        finally:
-            conn.close()
+
+    def pool_summary(self) -> str:
+        stats = self._pool.get_stats()
+        avg = _pool_waits.total / _pool_waits.count if _pool_waits.count else 0.0
+        return (
+            f"DB pool: {stats.get('pool_size', 0)} connections (max {self._pool.max_size}), "
+            f"{_pool_waits.count} checkouts, wait avg {avg * 1000:.1f}ms / max {_pool_waits.max * 1000:.1f}ms, "
+            f"{stats.get('requests_errors', 0)} errors, {stats.get('connections_lost', 0)} lost"
+        )
 
     @db_operation_with_retry
-    def get_kleinanzeigen_ids_by_state(self, state: str) -> list[str]:
-        self.logger.debug(f"Getting Kleinanzeigen IDs for state: {state}")
+    def get_kleinanzeigen_ids_by_states(self, states: list[str]) -> list[str]:
+        """Kleinanzeigen location ids of all the given states, in one query."""
+        self.logger.debug(f"Getting Kleinanzeigen IDs for states: {states}")
         with self._db() as (_, cursor):
-            cursor.execute(
-                GET_KLEINANZEIGEN_IDS_BY_STATE_SQL,
-                {"state": state},
-            )
+            cursor.execute(GET_KLEINANZEIGEN_IDS_BY_STATES_SQL, {"states": list(states)})
             results = cursor.fetchall()
         ids = [row["kleinanzeigen_location_id"] for row in results]
-        self.logger.debug(f"Found {len(ids)} IDs for state: {state}")
+        self.logger.debug(f"Found {len(ids)} IDs for states: {states}")
         return ids
     
+    @db_operation_with_retry
+    def get_known_listings(self, source: ListingSource, external_ids: list[str]) -> dict[str, datetime | None]:
+        """Returns `modified_at` of the given listings that are already stored, keyed by external id."""
+        with self._db() as (_, cursor):
+            cursor.execute(GET_KNOWN_LISTINGS_SQL, {"source": source.value, "external_ids": external_ids})
+            results = cursor.fetchall()
+        return {row["external_id"]: row["modified_at"] for row in results}
+
+    def stream_listing_modified_at(self, source: ListingSource) -> Iterator[tuple[str, datetime | None]]:
+        """Yields (external_id, modified_at) of all stored listings of `source` through a server-side cursor."""
+        with self._pool.connection() as conn:
+            with conn.cursor(name="stream_listing_modified_at", row_factory=psycopg.rows.tuple_row) as cursor:
+                cursor.itersize = 50_000
+                cursor.execute(STREAM_LISTING_MODIFIED_AT_SQL, {"source": source.value})
+                yield from cursor
+
+    @db_operation_with_retry
+    def touch_listings(self, source: ListingSource, external_ids: list[str]) -> None:
+        """Only refreshes `last_seen_at` of listings that are stored and unchanged."""
+        if not external_ids:
+            return
+        with self._db() as (connection, cursor):
+            cursor.execute(
+                TOUCH_LISTINGS_SQL,
+                {"source": source.value, "external_ids": external_ids, "last_seen_at": datetime.now(berlin_tz)},
+            )
+            connection.commit()
+        self.logger.debug(f"Touched {len(external_ids)} unchanged listings")
+
     @db_operation_with_retry
     def set_new_listing_data(self, listings: list[NewListing]) -> None:
         if not listings:
@@ -148,55 +287,51 @@ class Database:
             ]
         )
 
-        with self._db() as (connection, cursor):
-            self.logger.debug(f"Batch setting property data for {len(listings)} listings")
-            cursor.executemany(
-                SET_NEW_LISTING_DATA_SQL,
-                [
-                    {
-                        "source": listing.source.value,
-                        "external_id": listing.external_id,
-                        "modified_at": listing.modified_at,
-                        "created_at": listing.created_at if listing.created_at else datetime.now(berlin_tz),
-                    }
-                    for listing in listings
-                ],
-            )
-
-            self.logger.debug(f"Selecting property IDs")
-
-            external_ids = [l.external_id for l in listings]
-            sources = [l.source.value for l in listings]
-            cursor.execute(SELECT_PROPERTY_IDS_SQL, {"external_ids": external_ids, "sources": sources})
-            results = cursor.fetchall()
-            property_id_mapping: dict[str, str] = {row["external_id"]: row["id"] for row in results}
-
-            if len(property_id_mapping) != len(listings):
-                raise ValueError(f"Expected {len(listings)} property IDs, but got {len(property_id_mapping)}")
-
-            self.logger.debug(f"Setting general and system data")
-            cursor.executemany(
-                GENERAL_INSERT_SQL,
-                [
-                    {
-                        "property_id": property_id_mapping[listing.external_id],
-                        "active": True,
-                    }
-                    for listing in listings
-                ],
+        now = datetime.now(berlin_tz)
+        rows = []
+        for listing in listings:
+            modified_at = as_berlin(listing.modified_at)
+            rows.append(
+                {
+                    "source": listing.source.value,
+                    "external_id": listing.external_id,
+                    "modified_at": modified_at.isoformat() if modified_at else None,
+                    "created_at": (as_berlin(listing.created_at) or now).isoformat(),
+                }
             )
+        params = {"listings": Jsonb(rows), "last_seen_at": now}
+        with self._db() as (connection, cursor):
+            # Statement and COMMIT go out together: one round trip per batch
+            with connection.pipeline() if _PIPELINE_SUPPORTED else nullcontext():
+                cursor.execute(UPSERT_LISTINGS_SQL, params)
+                connection.commit()
+        self.logger.debug(f"Batch listing data set for {len(listings)} listings")
 
-            self.logger.debug(f"Setting system data")
-            cursor.executemany(
-                SYSTEM_INSERT_SQL,
-                [
-                    {
-                        "property_id": property_id_mapping[listing.external_id],
-                        "last_seen_at": datetime.now(berlin_tz),
-                    }
-                    for listing in listings
-                ],
-            )
+    @db_operation_with_retry
+    def bulk_upsert_listings(self, listings: list[NewListing]) -> None:
+        """
+        Same result as `set_new_listing_data` for a large batch in one transaction:
+        the rows are COPYed into a temp table and merged into property, general
+        and system with one statement each.
+        """
+        if not listings:
+            return
 
+        now = datetime.now(berlin_tz)
+        with self._db() as (connection, cursor):
+            cursor.execute(CREATE_LISTING_STAGING_SQL)
+            with cursor.copy(COPY_LISTING_STAGING_SQL) as copy:
+                for listing in listings:
+                    copy.write_row(
+                        (
+                            listing.source.value,
+                            listing.external_id,
+                            as_berlin(listing.modified_at),
+                            as_berlin(listing.created_at) or now,
+                        )
+                    )
+            cursor.execute(MERGE_STAGING_PROPERTY_SQL)
+            cursor.execute(MERGE_STAGING_GENERAL_SQL)
+            cursor.execute(MERGE_STAGING_SYSTEM_SQL, {"last_seen_at": now})
             connection.commit()
-            self.logger.debug(f"Batch listing data set for {len(listings)} listings")
\ No newline at end of file
+        self.logger.debug(f"Bulk upserted {len(listings)} listings")
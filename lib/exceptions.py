@@ -37,6 +37,22 @@ class InactiveListingError(ScrapeError):
         super().__init__(f'Listing "{external_id}" is inactive')
 
 
+class PageNotRecordedError(ScrapeError):
+    """Raised in replay mode when a URL is not in the page corpus."""
+
+    def __init__(self, url: str):
+        super().__init__(f'Page "{url}" is not in the corpus')
+
+
+class BotDetectionError(ScrapeError):
+    """Raised when a bot check or rate limit page is served instead of the content."""
+
+    def __init__(self, url: str, verdict: str):
+        super().__init__(f'Page "{url}" is a {verdict} page')
+        self.url = url
+        self.verdict = verdict
+
+
 class ExecutionStoppedError(Exception):
     """Raised when the execution is stopped."""
 
@@ -58,3 +74,12 @@ class HTMLValidationError(Exception):
 
     def __init__(self, message: str = "HTML content is invalid or empty"):
         super().__init__(message)
+
+
+class ListingWriteError(Exception):
+    """Raised at the end of a run when the listings of some pages could not be written."""
+
+    def __init__(self, source: str, pages: int):
+        super().__init__(f"Listings of {pages} {source} pages could not be written")
+        self.source = source
+        self.pages = pages
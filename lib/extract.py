@@ -0,0 +1,128 @@
+import re
+from functools import cached_property
+
+from bs4 import BeautifulSoup
+from lxml import html as lxml_html
+
+from lib.metrics import get_metrics
+
+
+class ResultPage:
+    """
+    A fetched search result page. The raw HTML is what the fast extractors
+    work on; the lxml and BeautifulSoup trees are only built if a finder asks
+    for them.
+    """
+
+    def __init__(self, html: str):
+        self.html = html
+
+    @cached_property
+    def soup(self) -> BeautifulSoup:
+        with get_metrics().timer("html_parse_seconds", parser="beautifulsoup"):
+            return BeautifulSoup(self.html, "lxml")
+
+    @cached_property
+    def tree(self) -> lxml_html.HtmlElement:
+        """The plain lxml tree, several times cheaper to build than the soup."""
+        with get_metrics().timer("html_parse_seconds", parser="lxml"):
+            return lxml_html.document_fromstring(self.html)
+
+
+_TAG_RE = re.compile(r"<[^>]*>")
+
+
+def _text(fragment: str) -> str:
+    """Text of an HTML fragment like `get_text(strip=True)` for the short labels we read."""
+    return "".join(part.strip() for part in _TAG_RE.split(fragment))
+
+
+def _element_by_testid(html: str, testid: str, start: int = 0, end: int | None = None) -> list[tuple[str, int]]:
+    """(tag name, offset after the opening tag) of every element with the given data-testid."""
+    pattern = re.compile(r"<(\w+)\b[^>]*\bdata-testid=[\"']?" + re.escape(testid) + r"[\"'\s>]")
+    return [(m.group(1), html.index(">", m.end() - 1) + 1) for m in pattern.finditer(html, start, end or len(html))]
+
+
+def _inner_text(html: str, tag: str, offset: int) -> str | None:
+    close = html.find(f"</{tag}>", offset)
+    return None if close == -1 else _text(html[offset:close])
+
+
+# --- Immoscout ---
+
+def immoscout_result_list(html: str) -> str | None:
+    """The `resultListModel` JSON of the `IS24.resultList` script, or None if it is not on the page."""
+    script = html.find("IS24.resultList")
+    if script == -1:
+        return None
+    start = html.find("resultListModel: ", script)
+    if start == -1:
+        return None
+    end = html.find("isUserLoggedIn", start)
+    if end == -1:
+        return None
+    start += len("resultListModel: ")
+    return html[start:end].strip()[:-1].replace(": undefined", ": null")
+
+
+def immoscout_pages_count(html: str) -> int | None:
+    """Number on the last pagination button; 1 with fewer than two buttons, None if unreadable."""
+    buttons = _element_by_testid(html, "pagination-button")
+    if len(buttons) < 2:
+        return 1
+    text = _inner_text(html, *buttons[-1])
+    return int(text) if text and text.isdigit() else None
+
+
+# --- Immowelt ---
+
+_IMMOWELT_MARKER = r"\"classified-serp-init-data\":\""
+
+
+def immowelt_serp_data(html: str) -> str | None:
+    """The LZ-compressed `classified-serp-init-data` of the `__UFRN_FETCHER__` script, or None."""
+    script = html.find("__UFRN_FETCHER__")
+    if script == -1:
+        return None
+    start = html.find(_IMMOWELT_MARKER, script)
+    if start == -1:
+        return None
+    start += len(_IMMOWELT_MARKER)
+    end = html.find('"}', start)
+    return None if end == -1 else html[start:end]
+
+
+def immowelt_pages_count(html: str) -> int | None:
+    """Number on the second to last button of the pagination bar; 1 with fewer than two buttons, None if unreadable."""
+    navs = _element_by_testid(html, "serp-pagination-testid")
+    if not navs or navs[0][0] != "nav":
+        return None
+    start = navs[0][1]
+    end = html.find("</nav>", start)
+    if end == -1:
+        return None
+    buttons = re.findall(r"<button\b[^>]*>(.*?)</button>", html[start:end], re.S)
+    if len(buttons) < 2:
+        return 1
+    text = _text(buttons[-2])
+    return int(text) if text.isdigit() else None
+
+
+# --- Kleinanzeigen ---
+
+def kleinanzeigen_ad_ids(tree: lxml_html.HtmlElement) -> list[str] | None:
+    """`data-adid` of the articles in the result list, in page order; None if there is no result list."""
+    result_list = tree.xpath('(//ul[@id="srchrslt-adtable"])[1]')
+    if not result_list:
+        return None
+    return result_list[0].xpath(".//article/@data-adid")
+
+
+def kleinanzeigen_summary(tree: lxml_html.HtmlElement) -> list[str] | None:
+    """Text nodes of the `span.breadcrump-summary` ("1 - 25 von 1.234 Ergebnissen"), or None if it is missing."""
+    summary = tree.xpath(
+        '(//span[contains(concat(" ", normalize-space(@class), " "), " breadcrump-summary ")])[1]'
+    )
+    if not summary:
+        return None
+    return summary[0].xpath(".//text()")
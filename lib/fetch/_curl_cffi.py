@@ -1,35 +1,172 @@
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from urllib.parse import urlsplit
 from curl_cffi import requests
-from tenacity import retry, stop_after_attempt, wait_fixed, before_sleep_log
+from tenacity import retry, stop_after_attempt, before_sleep_log
 from lib.config import get_config
+from lib.exceptions import BotDetectionError, HTMLValidationError
 from lib.logger import get_logger
+from lib.fetch.classify import classify_page, raise_for_verdict, wait_for_retry
+from lib.fetch.rate_limiter import get_rate_limiter
+from lib.metrics import count_retries, get_metrics
 
 config = get_config()
 logger = get_logger("_curl_cffi")
 
+
+def _session_options(proxy_url: str | None) -> dict:
+    return {
+        "proxies": {"http": proxy_url, "https": proxy_url} if proxy_url else None,
+        "impersonate": "chrome",
+        "timeout": config.curl_cffi.timeout,
+        "http_version": getattr(config.curl_cffi, "http_version", "v2tls"),
+    }
+
+
+class SessionPool:
+    """
+    Thread-safe pool of long-lived curl_cffi sessions, keyed by (host, proxy).
+
+    Sessions keep their connections alive between requests, so the pages of one
+    host reuse the TCP/TLS connection (and proxy tunnel) instead of paying a new
+    handshake per URL. At most `size` sessions exist per key; callers wait for a
+    free one when all of them are busy.
+    """
+
+    def __init__(self, size: int | None = None, **session_kwargs):
+        self.size = size or getattr(config.curl_cffi, "pool_size", config.curl_cffi.max_workers)
+        self._session_kwargs = session_kwargs
+        self._lock = threading.Lock()
+        self._slots: dict[tuple[str, str | None], threading.BoundedSemaphore] = {}
+        self._idle: dict[tuple[str, str | None], list[requests.Session]] = defaultdict(list)
+        self._sessions: set[requests.Session] = set()
+
+    def _new_session(self, proxy_url: str | None) -> requests.Session:
+        session = requests.Session(**(_session_options(proxy_url) | self._session_kwargs))
+        with self._lock:
+            self._sessions.add(session)
+        return session
+
+    def _discard(self, session: requests.Session):
+        with self._lock:
+            self._sessions.discard(session)
+        session.close()
+
+    @contextmanager
+    def session(self, url: str, proxy_url: str | None = None):
+        """Borrow a session for the host of `url`, creating one if none is idle."""
+        key = (urlsplit(url).netloc, proxy_url)
+        with self._lock:
+            slots = self._slots.setdefault(key, threading.BoundedSemaphore(self.size))
+        slots.acquire()
+        try:
+            with self._lock:
+                session = self._idle[key].pop() if self._idle[key] else None
+            if session is None:
+                session = self._new_session(proxy_url)
+            try:
+                yield session
+            except Exception:
+                # The connection may be in an unknown state (or the host blocked
+                # its cookies), so don't hand this session out again.
+                self._discard(session)
+                raise
+            with self._lock:
+                self._idle[key].append(session)
+        finally:
+            slots.release()
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions)
+            self._sessions.clear()
+            self._idle.clear()
+        for session in sessions:
+            session.close()
+
+
+def _page(url: str, response, slot) -> str:
+    """The page of `response`; raises if it failed or is a bot check, rate limit or empty page."""
+    # Every response costs bandwidth (of the proxy), also the ones that are retried
+    get_metrics().inc("downloaded_bytes_total", len(response.content), host=urlsplit(url).netloc)
+    verdict = classify_page(response.content, response.status_code)
+    slot.blocked = verdict.blocked
+    raise_for_verdict(url, verdict)
+    if response.status_code != 200:
+        raise RuntimeError(f"Failed to fetch {url}: Status code {response.status_code}")
+    return response.text
+
+
 @retry(
     stop=stop_after_attempt(config.curl_cffi.max_retries),
-    wait=wait_fixed(config.curl_cffi.retry_delay),
+    wait=wait_for_retry(config.curl_cffi),
     reraise=True,
-    before_sleep=before_sleep_log(logger, config.log_level)
+    before_sleep=count_retries("curl_cffi", before_sleep_log(logger, logging.WARNING)),
 )
-def get_html_curlcffi(url: str, proxy_url: str | None = None) -> str:
-    try: 
-        proxies = {"http": proxy_url, "https": proxy_url} if proxy_url else None
-        response = requests.get(
-            url,
-            proxies=proxies,
-            impersonate="chrome",
-            timeout=config.curl_cffi.timeout
-        )
-        if response.status_code != 200:
-            raise RuntimeError(f"Failed to fetch {url}: Status code {response.status_code}")
-        return response.text
+def get_html_curlcffi(url: str, proxy_url: str | None = None, sessions: SessionPool | None = None) -> str:
+    try:
+        with get_rate_limiter().slot(url) as slot:
+            if sessions is None:
+                proxies = {"http": proxy_url, "https": proxy_url} if proxy_url else None
+                response = requests.get(
+                    url,
+                    proxies=proxies,
+                    impersonate="chrome",
+                    timeout=config.curl_cffi.timeout
+                )
+                return _page(url, response, slot)
+            # Raised inside the session block, so a blocked session is discarded
+            with sessions.session(url, proxy_url) as session:
+                return _page(url, session.get(url), slot)
+    except (BotDetectionError, HTMLValidationError):
+        raise
     except Exception as e:
         raise RuntimeError(f"Failed to fetch {url} with proxy {proxy_url or 'None'}: {e}")
 
+
+def new_async_session(proxy_url: str | None = None, max_clients: int | None = None) -> requests.AsyncSession:
+    """
+    One AsyncSession multiplexes all in-flight requests of an event loop over
+    its own connection pool, so a single instance serves the whole async run.
+    """
+    max_clients = max_clients or getattr(config.curl_cffi, "concurrency", config.curl_cffi.max_workers)
+    return requests.AsyncSession(max_clients=max_clients, **_session_options(proxy_url))
+
+
+@retry(
+    stop=stop_after_attempt(config.curl_cffi.max_retries),
+    wait=wait_for_retry(config.curl_cffi),
+    reraise=True,
+    before_sleep=count_retries("curl_cffi", before_sleep_log(logger, logging.WARNING)),
+)
+async def get_html_curlcffi_async(session: requests.AsyncSession, url: str) -> str:
+    try:
+        async with get_rate_limiter().slot_async(url) as slot:
+            return _page(url, await session.get(url), slot)
+    except (BotDetectionError, HTMLValidationError):
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Failed to fetch {url} asynchronously: {e}")
+
+
+# --- Backend interface, see lib/fetch/fetcher.py ---
+
+def new_pool(proxy_url: str | None = None) -> SessionPool:
+    return SessionPool()
+
+
+def fetch(url: str, proxy_url: str | None, pool: SessionPool | None) -> str:
+    return get_html_curlcffi(url, proxy_url=proxy_url, sessions=pool)
+
+
+new_async_client = new_async_session
+fetch_async = get_html_curlcffi_async
+
 # test fetch_html
 if __name__ == "__main__":
     test_url = "https://www.kleinanzeigen.de/"
     proxy_url = None
     html = get_html_curlcffi(test_url, proxy_url)
-    print(f"Fetched {len(html)} characters from {test_url}")
\ No newline at end of file
+    print(f"Fetched {len(html)} characters from {test_url}")
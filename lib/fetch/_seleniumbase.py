@@ -1,18 +1,170 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
 from seleniumbase import SB
-from tenacity import retry, stop_after_attempt, wait_fixed, before_sleep_log
+from tenacity import retry, stop_after_attempt, before_sleep_log
 from lib.config import get_config
+from lib.exceptions import BotDetectionError, HTMLValidationError
 from lib.logger import get_logger
-from lib.helpers import has_bot_detection
+from lib.fetch.classify import Verdict, classify_page, raise_for_verdict, wait_for_retry
+from lib.fetch.rate_limiter import get_rate_limiter
+from lib.metrics import count_retries
 
 config = get_config()
 logger = get_logger("_seleniumbase")
 
 
+def _sb_options(
+    proxy_url: str | None = None,
+    uc: bool | None = None,
+    xvfb: bool | None = None,
+    headless: bool | None = None,
+    locale: str | None = None,
+    incognito: bool | None = None,
+    block_images: bool | None = None,
+) -> dict:
+    # Use config defaults if not provided
+    return {
+        "uc": uc if uc is not None else config.seleniumbase.uc,
+        "proxy": proxy_url if proxy_url else None,
+        "xvfb": xvfb if xvfb is not None else config.seleniumbase.xvfb,
+        "headless": headless if headless is not None else config.seleniumbase.headless,
+        "locale": locale if locale is not None else config.seleniumbase.locale,
+        "incognito": incognito if incognito is not None else config.seleniumbase.incognito,
+        "block_images": block_images if block_images is not None else config.seleniumbase.block_images,
+    }
+
+
+def _load_page(sb, url: str, timeout: int) -> tuple[str, Verdict]:
+    """Opens `url` in the browser, returns the page source and what it is (after one refresh if blocked)."""
+    with get_rate_limiter().slot(url) as slot:
+        sb.activate_cdp_mode(url)
+        sb.wait_for_ready_state_complete(timeout=timeout)
+        sb.sleep(2)
+        html = sb.get_page_source()
+        verdict = classify_page(html)
+        slot.blocked = verdict.blocked
+
+    if verdict.blocked:
+        logger.info("Bot detection detected, refreshing page and retrying once...")
+        sb.refresh()
+        sb.wait_for_ready_state_complete(timeout=timeout)
+        sb.sleep(5)
+        html = sb.get_page_source()
+        verdict = classify_page(html)
+
+    return html, verdict
+
+
+class _Browser:
+    """A launched SB context that stays open until it is closed explicitly."""
+
+    def __init__(self, options: dict):
+        self._context = SB(**options)
+        self.sb = self._context.__enter__()
+        self.pages = 0
+
+    def close(self):
+        try:
+            self._context.__exit__(None, None, None)
+        except Exception as e:
+            logger.warning(f"Failed to close browser cleanly: {e}")
+
+
+class BrowserPool:
+    """
+    Keeps up to `size` browsers alive for the whole run and hands them out one
+    page at a time. A browser is replaced after `max_pages` pages or as soon as
+    it got stuck on a bot check, so a flagged profile is not reused.
+    """
+
+    def __init__(self, proxy_url: str | None = None, size: int | None = None, max_pages: int | None = None):
+        self.size = size or getattr(config.seleniumbase, "pool_size", config.seleniumbase.max_workers)
+        self.max_pages = max_pages or getattr(config.seleniumbase, "max_pages_per_browser", 50)
+        self._options = _sb_options(proxy_url)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle: list[_Browser] = []
+        self._browsers: set[_Browser] = set()
+
+        self.launches = 0
+        self.launch_seconds = 0.0
+        self.pages = 0
+        self.page_seconds = 0.0
+        self.max_page_seconds = 0.0
+
+    def _launch(self) -> _Browser:
+        start = time.perf_counter()
+        browser = _Browser(self._options)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._browsers.add(browser)
+            self.launches += 1
+            self.launch_seconds += elapsed
+        logger.debug(f"Launched browser #{self.launches} in {elapsed:.1f}s")
+        return browser
+
+    def _retire(self, browser: _Browser):
+        with self._lock:
+            self._browsers.discard(browser)
+        browser.close()
+
+    @contextmanager
+    def browser(self):
+        """Borrow a browser, launching a new one if none is idle."""
+        self._slots.acquire()
+        try:
+            with self._lock:
+                browser = self._idle.pop() if self._idle else None
+            if browser is None:
+                browser = self._launch()
+
+            start = time.perf_counter()
+            try:
+                yield browser
+            except Exception:
+                self._retire(browser)
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.pages += 1
+                    self.page_seconds += elapsed
+                    self.max_page_seconds = max(self.max_page_seconds, elapsed)
+
+            browser.pages += 1
+            if browser.pages >= self.max_pages:
+                logger.debug(f"Recycling browser after {browser.pages} pages")
+                self._retire(browser)
+            else:
+                with self._lock:
+                    self._idle.append(browser)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            browsers = list(self._browsers)
+            self._browsers.clear()
+            self._idle.clear()
+        for browser in browsers:
+            browser.close()
+
+    def summary(self) -> str:
+        avg_page = self.page_seconds / self.pages if self.pages else 0.0
+        avg_launch = self.launch_seconds / self.launches if self.launches else 0.0
+        return (
+            f"Browser launches: {self.launches} (avg {avg_launch:.1f}s), "
+            f"pages: {self.pages}, page latency avg {avg_page:.1f}s / max {self.max_page_seconds:.1f}s"
+        )
+
+
 @retry(
     stop=stop_after_attempt(config.seleniumbase.max_retries),
-    wait=wait_fixed(config.seleniumbase.retry_delay),
+    wait=wait_for_retry(config.seleniumbase),
     reraise=True,
-    before_sleep=before_sleep_log(logger, config.log_level)
+    before_sleep=count_retries("seleniumbase", before_sleep_log(logger, logging.WARNING)),
 )
 def get_html_seleniumbase(
     url: str,
@@ -24,46 +176,42 @@ def get_html_seleniumbase(
     locale: str | None = None,
     incognito: bool | None = None,
     block_images: bool | None = None,
+    pool: BrowserPool | None = None,
 ) -> str:
-    # Use config defaults if not provided
     timeout = timeout if timeout is not None else config.seleniumbase.timeout
-    uc = uc if uc is not None else config.seleniumbase.uc
-    xvfb = xvfb if xvfb is not None else config.seleniumbase.xvfb
-    headless = headless if headless is not None else config.seleniumbase.headless
-    locale = locale if locale is not None else config.seleniumbase.locale
-    incognito = incognito if incognito is not None else config.seleniumbase.incognito
-    block_images = block_images if block_images is not None else config.seleniumbase.block_images
 
     try:
-        with SB(
-            uc=uc,
-            proxy=proxy_url if proxy_url else None,
-            xvfb=xvfb,
-            headless=headless,
-            locale=locale,
-            incognito=incognito,
-            block_images=block_images,
-        ) as sb:
-            sb.activate_cdp_mode(url)
-            sb.wait_for_ready_state_complete(timeout=timeout)
-            sb.sleep(2)
-            html = sb.get_page_source()
-
-            if has_bot_detection(html):
-                logger.info("Bot detection detected, refreshing page and retrying once...")
-                sb.refresh()
-                sb.wait_for_ready_state_complete(timeout=timeout)
-                sb.sleep(5)
-                html = sb.get_page_source()
+        if pool is not None:
+            with pool.browser() as browser:
+                html, verdict = _load_page(browser.sb, url, timeout)
+                # Raised inside the block, so a blocked browser is retired
+                raise_for_verdict(url, verdict)
+            return html
+
+        with SB(**_sb_options(proxy_url, uc, xvfb, headless, locale, incognito, block_images)) as sb:
+            html, verdict = _load_page(sb, url, timeout)
+        raise_for_verdict(url, verdict)
 
         return html
+    except (BotDetectionError, HTMLValidationError):
+        raise
     except Exception as e:
         logger.error(f"Failed to fetch {url} with SeleniumBase: {e}")
         raise RuntimeError(f"Failed to fetch {url} with SeleniumBase: {e}")
 
+
+# --- Backend interface, see lib/fetch/fetcher.py ---
+
+def new_pool(proxy_url: str | None = None) -> BrowserPool:
+    return BrowserPool(proxy_url)
+
+
+def fetch(url: str, proxy_url: str | None, pool: BrowserPool | None) -> str:
+    return get_html_seleniumbase(url, proxy_url=proxy_url, pool=pool)
+
 # test fetch_html
 if __name__ == "__main__":
     test_url = "https://www.immobilienscout24.de/expose/165390369"
     proxy_url = "http://35.234.92.79:8888"
     html = get_html_seleniumbase(test_url, proxy_url=proxy_url)
-    print(f"Fetched {len(html)} characters from {test_url}")
\ No newline at end of file
+    print(f"Fetched {len(html)} characters from {test_url}")
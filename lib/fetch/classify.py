@@ -0,0 +1,133 @@
+import re
+from enum import Enum
+
+from lib.exceptions import BotDetectionError, HTMLValidationError
+from lib.logger import get_logger
+from lib.metrics import get_metrics
+
+logger = get_logger("classify")
+
+
+class Verdict(Enum):
+    OK = "ok"
+    CAPTCHA = "captcha"
+    RATE_LIMITED = "rate_limited"
+    EMPTY = "empty"
+    # Not recognisably HTML (a proxy error text, JSON, ...), left to the parser
+    UNKNOWN = "unknown"
+
+    @property
+    def blocked(self) -> bool:
+        return self in (Verdict.CAPTCHA, Verdict.RATE_LIMITED)
+
+
+_PATTERNS = {
+    "ich bin kein roboter": Verdict.CAPTCHA,  # German reCAPTCHA text
+    "i am not a robot": Verdict.CAPTCHA,
+    "i’m not a robot": Verdict.CAPTCHA,
+    "captcha": Verdict.CAPTCHA,
+    "unusual traffic": Verdict.CAPTCHA,
+    "verify you are a human": Verdict.CAPTCHA,
+    "verify that you are human": Verdict.CAPTCHA,
+    "too many requests": Verdict.RATE_LIMITED,
+    "zu viele anfragen": Verdict.RATE_LIMITED,
+}
+_PATTERNS_BYTES = {pattern.encode(): pattern for pattern in _PATTERNS}
+# In the id or class of a challenge container, e.g. <div class="g-recaptcha">, <form id="challenge-form">
+_CONTAINER_PATTERNS = ("captcha", "challenge")
+_CONTAINER_PATTERNS_BYTES = {pattern.encode(): pattern for pattern in _CONTAINER_PATTERNS}
+
+
+def _regex(pattern: str) -> tuple[re.Pattern, re.Pattern]:
+    """`pattern` compiled for str and for bytes bodies."""
+    return (
+        re.compile(pattern, re.IGNORECASE | re.DOTALL),
+        re.compile(pattern.encode(), re.IGNORECASE | re.DOTALL),
+    )
+
+
+_TITLE = _regex(r"<title[^>]*>(.*?)</title")
+_HEADING = _regex(r"<h1[^>]*>(.*?)</h1")
+_CONTAINER = _regex(r"""<(?:div|form|section)\b[^>]*?\b(?:id|class)\s*=\s*["']([^"']*)["']""")
+_HTML = _regex(r"<(?:!doctype|html|head|body)")
+
+# Bot check and rate limit pages are a few KB; a bigger document is a real
+# page, whose only place for such a message is its title. Smaller pages are
+# also checked for it in their main heading and for a challenge container.
+# A word anywhere in the body (a captcha script of a login link, a listing
+# text) is not enough: a short "no results" page would be taken for a block.
+_SMALL_PAGE = 64 * 1024
+# Where the markup and the title of a page have to start
+_HEAD_REGION = 16 * 1024
+
+
+def classify_page(body: bytes | str, status: int | None = None) -> Verdict:
+    """
+    What a response is, from its status and the block markers in the body
+    (str, or the undecoded bytes). Big documents are never copied or scanned
+    beyond their head.
+    """
+    with get_metrics().timer("bot_check_seconds"):
+        verdict, found = _classify(body, status)
+    if verdict is not Verdict.OK:
+        get_metrics().inc("page_verdicts_total", verdict=verdict.value)
+    if found:
+        logger.info(f"Bot detection pattern found in HTML: {found!r}")
+    return verdict
+
+
+def _classify(body: bytes | str, status: int | None) -> tuple[Verdict, str | None]:
+    if status == 429:
+        return Verdict.RATE_LIMITED, None
+    if len(body) < 1024 and not body.strip():
+        return Verdict.EMPTY, None
+
+    is_bytes = isinstance(body, bytes)
+    flavor = int(is_bytes)
+    empty = body[:0]
+    title = _TITLE[flavor].search(body, 0, _HEAD_REGION)
+    messages = [title.group(1)] if title else []
+    containers = []
+    if len(body) <= _SMALL_PAGE:
+        messages.extend(_HEADING[flavor].findall(body))
+        containers = _CONTAINER[flavor].findall(body)
+
+    text = (b"\n" if is_bytes else "\n").join(messages).lower() if messages else empty
+    patterns = _PATTERNS_BYTES if is_bytes else _PATTERNS
+    found = next((pattern for pattern in patterns if pattern in text), None)
+    if found is not None:
+        found = _PATTERNS_BYTES[found] if is_bytes else found
+        return _PATTERNS[found], found
+
+    if containers:
+        text = (b" " if is_bytes else " ").join(containers).lower()
+        patterns = _CONTAINER_PATTERNS_BYTES if is_bytes else _CONTAINER_PATTERNS
+        found = next((pattern for pattern in patterns if pattern in text), None)
+        if found is not None:
+            found = _CONTAINER_PATTERNS_BYTES[found] if is_bytes else found
+            return Verdict.CAPTCHA, found
+
+    if not _HTML[flavor].search(body, 0, _HEAD_REGION):
+        return Verdict.UNKNOWN, None
+    return Verdict.OK, None
+
+
+def raise_for_verdict(url: str, verdict: Verdict):
+    """Rejects the pages that can't be parsed, so the fetch is retried (and the failure counted) instead."""
+    if verdict.blocked:
+        raise BotDetectionError(url, verdict.value)
+    if verdict is Verdict.EMPTY:
+        raise HTMLValidationError(f"Empty response for URL {url}")
+
+
+def wait_for_retry(backend_config):
+    """
+    tenacity `wait` of a fetch backend: `retry_delay` after errors, and after
+    bot checks `block_retry_delay` (default 5s), doubling with every attempt.
+    """
+    def wait(retry_state) -> float:
+        if isinstance(retry_state.outcome.exception(), BotDetectionError):
+            block_delay = getattr(backend_config, "block_retry_delay", 5)
+            return block_delay * 2 ** (retry_state.attempt_number - 1)
+        return backend_config.retry_delay
+    return wait
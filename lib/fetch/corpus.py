@@ -0,0 +1,73 @@
+import gzip
+import hashlib
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator
+from urllib.parse import urlsplit
+
+from lib.config import BASE_DIR
+from lib.logger import get_logger
+
+logger = get_logger("corpus")
+
+_TIMESTAMP = "%Y%m%dT%H%M%S%fZ"
+
+
+class PageCorpus:
+    """
+    Fetched pages on disk, for replaying a run and benchmarking the parsers
+    without hitting the sites.
+
+    Layout: `<root>/<host>/<url hash>/url` holds the URL and every capture of
+    it is stored next to it as `<UTC timestamp>.html.gz`. Replay serves the
+    newest capture of a URL.
+    """
+
+    def __init__(self, root: Path | str):
+        root = Path(root)
+        self.root = root if root.is_absolute() else BASE_DIR / root
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.replayed = 0
+
+    def _url_dir(self, url: str) -> Path:
+        url_hash = hashlib.sha1(url.encode()).hexdigest()[:16]
+        return self.root / urlsplit(url).netloc / url_hash
+
+    def record(self, url: str, html: str) -> Path:
+        url_dir = self._url_dir(url)
+        url_dir.mkdir(parents=True, exist_ok=True)
+        (url_dir / "url").write_text(url, encoding="utf-8")
+        path = url_dir / f"{datetime.now(timezone.utc).strftime(_TIMESTAMP)}.html.gz"
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(html)
+        with self._lock:
+            self.recorded += 1
+        return path
+
+    def load(self, url: str) -> str | None:
+        """The newest capture of `url`, or None if it was never recorded."""
+        captures = sorted(self._url_dir(url).glob("*.html.gz"))
+        if not captures:
+            return None
+        with self._lock:
+            self.replayed += 1
+        with gzip.open(captures[-1], "rt", encoding="utf-8") as f:
+            return f.read()
+
+    def pages(self, host: str | None = None) -> Iterator[tuple[str, datetime, str]]:
+        """Yields (url, fetched_at, html) of every capture, optionally only of one host."""
+        for host_dir in [self.root / name for name in ([host] if host else self.hosts())]:
+            for url_dir in sorted(path for path in host_dir.glob("*") if path.is_dir()):
+                url = (url_dir / "url").read_text(encoding="utf-8")
+                for capture in sorted(url_dir.glob("*.html.gz")):
+                    fetched_at = datetime.strptime(capture.name.removesuffix(".html.gz"), _TIMESTAMP)
+                    with gzip.open(capture, "rt", encoding="utf-8") as f:
+                        yield url, fetched_at.replace(tzinfo=timezone.utc), f.read()
+
+    def hosts(self) -> list[str]:
+        return sorted(path.name for path in self.root.iterdir() if path.is_dir()) if self.root.exists() else []
+
+    def summary(self) -> str:
+        return f"Corpus {self.root}: {self.recorded} pages recorded, {self.replayed} replayed"
@@ -1,80 +1,256 @@
-import atexit
+import asyncio
+import importlib
+import threading
+from contextlib import contextmanager
+from types import ModuleType, SimpleNamespace
+from urllib.parse import urlsplit
 
-from lib.fetch._curl_cffi import get_html_curlcffi
-# from lib.fetch._playwright import get_html_playwright
-from lib.fetch._seleniumbase import get_html_seleniumbase
-from lib.proxy import FirewallManager
+from lib.fetch.corpus import PageCorpus
+from lib.fetch.proxy_pool import ProxyPool, new_proxy_pool, parse_proxy_urls
+from lib.fetch.rate_limiter import get_rate_limiter
 
 from lib.config import get_config
+from lib.exceptions import BotDetectionError, PageNotRecordedError
 from lib.logger import get_logger
+from lib.metrics import get_metrics
 
 config = get_config()
 logger = get_logger("fetcher")
 
+# Fetch method -> module that implements it. A backend module provides
+# `new_pool(proxy_url)` and `fetch(url, proxy_url, pool)`, and optionally
+# `new_async_client(proxy_url)` and `fetch_async(client, url)` for the asyncio
+# engine. It is imported when a fetcher first selects it, so a run only loads
+# the libraries (browsers, webdrivers) of the methods it is configured with.
+# Backends that see the raw response count it in `downloaded_bytes_total`.
+_BACKENDS: dict[str, str] = {}
+_loaded: dict[str, ModuleType] = {}
+_backends_lock = threading.Lock()
+
+
+def register_backend(method: str, module: str):
+    """Makes `module` (a dotted import path) the backend of `method`."""
+    _BACKENDS[method] = module
+
+
+register_backend("curl_cffi", "lib.fetch._curl_cffi")
+register_backend("seleniumbase", "lib.fetch._seleniumbase")
+# register_backend("playwright", "lib.fetch._playwright")
+
+
+def get_backend(method: str) -> ModuleType:
+    if method not in _BACKENDS:
+        raise ValueError(f"Unknown fetching method in config: {method}")
+    with _backends_lock:
+        if method not in _loaded:
+            _loaded[method] = importlib.import_module(_BACKENDS[method])
+        return _loaded[method]
+
+
+def _new_firewall_manager():
+    # google.cloud.compute_v1 is slow to import and only needed behind a proxy
+    from lib.proxy import FirewallManager
+
+    return FirewallManager()
+
+
+class FetchPools:
+    """
+    Backend pools (curl_cffi sessions, browsers) and the firewall
+    authorisation, shared by the fetchers of several finders that run in one
+    process. Pools are shared by the finders with the same method and proxy.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: dict[tuple[str, str | None], object] = {}
+        self._firewall = None
+
+    def pool(self, method: str, proxy_url: str | None):
+        backend = get_backend(method)
+        with self._lock:
+            if (method, proxy_url) not in self._pools:
+                self._pools[method, proxy_url] = backend.new_pool(proxy_url)
+            return self._pools[method, proxy_url]
+
+    def firewall(self):
+        """One manager for the process, it authorizes the runner's IP only once."""
+        with self._lock:
+            if self._firewall is None:
+                self._firewall = _new_firewall_manager()
+            return self._firewall
+
+    def close(self):
+        for pool in self._pools.values():
+            pool.close()
+
+
 class Fetcher:
-    def __init__(self, method: str, proxy_url: str | None = None):
+    def __init__(self, method: str, proxy_url: str | None = None, pools: FetchPools | None = None):
         """
-        :param method: "curl_cffi", "playwright", etc.
-        :param proxy_url: The full proxy string (e.g. http://user:pass@ip:port) or None
+        :param method: A registered backend: "curl_cffi", "seleniumbase"
+        :param proxy_url: The full proxy string (e.g. http://user:pass@ip:port), several
+            separated by commas to rotate over them, or None
+        :param pools: Pools shared with other fetchers of the process; they are closed by their owner
         """
         self.method = method
         self.proxy_url = proxy_url
-        
+        self._pools = pools
+        self._backend = get_backend(method)
+        proxy_urls = parse_proxy_urls(proxy_url)
+        self.proxies: ProxyPool | None = new_proxy_pool(proxy_urls) if proxy_urls else None
+        # Long-lived sessions or warm browsers per proxy, so pages of the same
+        # host reuse their connections instead of one handshake or launch per page
+        self._backend_pools = {
+            proxy: pools.pool(method, proxy) if pools else self._backend.new_pool(proxy)
+            for proxy in proxy_urls or [None]
+        }
+        # Created lazily, they have to live on the event loop of `fetch_async`
+        self._async_clients = {}
+        # Offline corpus: "record" stores every fetched page, "replay" serves them instead of fetching
+        corpus_config = getattr(config, "corpus", SimpleNamespace())
+        self.corpus: PageCorpus | None = None
+        self.corpus_mode: str | None = None
+        if getattr(corpus_config, "mode", None):
+            self.use_corpus(corpus_config.mode, getattr(corpus_config, "dir", "corpus"))
+
         # --- FIREWALL INTEGRATION ---
         self._fw_manager = None
-        if self.proxy_url:
+        if self.proxies:
             try:
                 logger.info("Proxy detected. initializing firewall...")
-                self._fw_manager = FirewallManager()
-                self._fw_manager.authorize_current_ip()
+                self._fw_manager = pools.firewall() if pools else _new_firewall_manager()
+                self._fw_manager.authorize_current_ip(ports=[urlsplit(url).port for url in proxy_urls])
             except Exception as e:
                 logger.warning(f"Could not update firewall rules: {e}")
                 # We don't raise here, in case the rule already exists 
                 # or we want to try fetching anyway.
 
+    def use_corpus(self, mode: str, root: str):
+        """Switches to "record" or "replay" against the page corpus in `root`."""
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown corpus mode: {mode}")
+        self.corpus_mode = mode
+        self.corpus = PageCorpus(root)
+        logger.info(f"Corpus {mode} mode, pages in {self.corpus.root}")
+
+    def _replay(self, url: str) -> str:
+        html = self.corpus.load(url)
+        if html is None:
+            raise PageNotRecordedError(url)
+        return html
+
     def fetch(self, url: str) -> str:
         """
         Determines proxy, selects method, and returns HTML string.
         """
-        
-        if self.method == "curl_cffi":
-            return get_html_curlcffi(url, proxy_url=self.proxy_url)
-            
-        elif self.method == "playwright":
-            # return get_html_playwright(url, proxy_url=proxy_url)
-            raise NotImplementedError("Playwright fetcher is not yet implemented.")
-            
-        elif self.method == "seleniumbase":
-            return get_html_seleniumbase(url, proxy_url=self.proxy_url)
-            
-        else:
-            raise ValueError(f"Unknown fetching method in config: {self.method}")
-        
-# TODO: Add bot detection detection
-
-def has_bot_detection(html: str, keywords: list[str] | None = None) -> bool:
-    """
-    Return True if the HTML indicates that a bot / captcha verification
-    page was shown instead of the real content.
+        if self.corpus_mode == "replay":
+            return self._replay(url)
 
-    Detection is done via simple case-insensitive keyword search.
-    """
-    default_keywords = [
-        "ich bin kein roboter",   # German reCAPTCHA text
-        "i am not a robot",
-        "i’m not a robot",
-        "captcha",
-        "unusual traffic",
-        "verify you are a human",
-        "verify that you are human",
-    ]
-
-    patterns = keywords or default_keywords
-    text = html.lower()
-
-    for phrase in patterns:
-        if phrase.lower() in text:
-            logger.info(f"Bot detection pattern found in HTML: {phrase!r}")
-            return True
-
-    return False
\ No newline at end of file
+        with self._measure(url):
+            html = self._fetch(url)
+        return self._fetched(url, html)
+
+    @contextmanager
+    def _measure(self, url: str):
+        """Latency and failures of a fetch (including the backend's retries) per host."""
+        host = urlsplit(url).netloc
+        metrics = get_metrics()
+        try:
+            with metrics.timer("fetch_seconds", host=host, method=self.method):
+                yield
+        except Exception:
+            metrics.inc("fetch_failures_total", host=host, method=self.method)
+            raise
+
+    def _fetched(self, url: str, html: str) -> str:
+        if self.corpus_mode == "record":
+            self.corpus.record(url, html)
+        return html
+
+    def _fetch(self, url: str) -> str:
+        if self.proxies is None:
+            return self._backend.fetch(url, None, self._backend_pools[None])
+
+        tried = []
+        while True:
+            lease = self.proxies.acquire(exclude=tried)
+            try:
+                html = self._backend.fetch(url, lease.url, self._backend_pools[lease.url])
+            except Exception as e:
+                if not self._fail_over(url, lease, e, tried):
+                    raise
+                continue
+            self.proxies.release(lease)
+            return html
+
+    def _fail_over(self, url: str, lease, error: Exception, tried: list[str]) -> bool:
+        """Records a fetch that failed through `lease`, returns whether to try another proxy."""
+        blocked = isinstance(error, BotDetectionError)
+        self.proxies.release(lease, error=not blocked, blocked=blocked)
+        tried.append(lease.url)
+        if not self.proxies.can_fail_over(tried):
+            return False
+        logger.info(f"Fetching {url} failed through {len(tried)} proxies, trying another one")
+        return True
+
+    async def fetch_async(self, url: str) -> str:
+        """
+        Async counterpart of `fetch`. Requests of backends with an async client
+        (curl_cffi) share one client, blocking backends (browsers) are run in a
+        worker thread.
+        """
+        if self.corpus_mode == "replay":
+            return self._replay(url)
+
+        with self._measure(url):
+            if not hasattr(self._backend, "fetch_async"):
+                html = await asyncio.to_thread(self._fetch, url)
+            elif self.proxies is None:
+                html = await self._backend.fetch_async(self._async_client(None), url)
+            else:
+                html = await self._fetch_async_via_proxies(url)
+        return self._fetched(url, html)
+
+    def _async_client(self, proxy_url: str | None):
+        if proxy_url not in self._async_clients:
+            self._async_clients[proxy_url] = self._backend.new_async_client(proxy_url)
+        return self._async_clients[proxy_url]
+
+    async def _fetch_async_via_proxies(self, url: str) -> str:
+        tried = []
+        while True:
+            lease = self.proxies.acquire(exclude=tried)
+            try:
+                html = await self._backend.fetch_async(self._async_client(lease.url), url)
+            except Exception as e:
+                if not self._fail_over(url, lease, e, tried):
+                    raise
+                continue
+            self.proxies.release(lease)
+            return html
+
+    async def aclose(self):
+        """Closes the clients used by `fetch_async`."""
+        for client in self._async_clients.values():
+            await client.close()
+        self._async_clients.clear()
+
+    def close(self):
+        """Releases the pooled sessions and shuts down the browsers, unless they are shared."""
+        if self._pools:
+            return
+        for pool in self._backend_pools.values():
+            pool.close()
+
+    def summary(self) -> list[str]:
+        """Statistics of the fetch backend for the run summary."""
+        lines = get_rate_limiter().summary()
+        for pool in self._backend_pools.values():
+            if hasattr(pool, "summary"):
+                lines.append(pool.summary())
+        if self.proxies:
+            lines.extend(self.proxies.summary())
+        if self.corpus:
+            lines.append(self.corpus.summary())
+        return lines
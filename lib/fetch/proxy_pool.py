@@ -0,0 +1,182 @@
+import threading
+import time
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from lib.config import get_config
+from lib.logger import get_logger
+from lib.metrics import get_metrics
+
+config = get_config()
+logger = get_logger("proxy_pool")
+
+# Weight of the newest request in the moving averages
+_ALPHA = 0.2
+# Success rate assumed for a proxy that fails every request, so its cost stays finite
+_MIN_SUCCESS = 0.05
+
+
+def parse_proxy_urls(value: str | None) -> list[str]:
+    """The proxies of a `PROXY_URL__<SITE>` value: one URL, or several separated by commas."""
+    if not value:
+        return []
+    return [url.strip() for url in value.split(",") if url.strip()]
+
+
+def proxy_label(url: str) -> str:
+    """host:port of a proxy, without the credentials, for logs and metric labels."""
+    parts = urlsplit(url)
+    return f"{parts.hostname}:{parts.port}" if parts.port else str(parts.hostname)
+
+
+class ProxyLease:
+    """A proxy handed out by `ProxyPool.acquire`, to be given back with `ProxyPool.release`."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.started = time.monotonic()
+
+
+class _Proxy:
+    def __init__(self, url: str):
+        self.url = url
+        self.label = proxy_label(url)
+        # Moving averages: seconds per successful request, share of errors and of bot check pages
+        self.latency: float | None = None
+        self.error_rate = 0.0
+        self.block_rate = 0.0
+        self.in_flight = 0
+        self.quarantined_until = 0.0
+        # Quarantines without a healthy stretch in between, each one doubles the next
+        self.strikes = 0
+
+        self.requests = 0
+        self.errors = 0
+        self.blocks = 0
+        self.quarantines = 0
+
+
+class ProxyPool:
+    """
+    The proxies of one site and their health: moving averages of the latency,
+    the error rate and the bot check rate of the requests through each one.
+
+    `acquire` hands out the proxy with the lowest expected cost of a
+    successful request (latency times the requests it is already serving,
+    divided by its success rate), so concurrent requests spread over the
+    proxies and a slow or blocked one gets few of them. A proxy whose error or
+    bot check rate passes `max_failure_rate` is quarantined for
+    `quarantine_seconds`. It comes back on probation, close to the threshold:
+    one more failure quarantines it again for twice as long (up to
+    `max_quarantine_seconds`), clean requests clear its record.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        quarantine_seconds: float = 30,
+        max_quarantine_seconds: float = 600,
+        max_failure_rate: float = 0.5,
+        failover: int = 1,
+    ):
+        if not urls:
+            raise ValueError("A proxy pool needs at least one proxy")
+        self.quarantine_seconds = quarantine_seconds
+        self.max_quarantine_seconds = max_quarantine_seconds
+        self.max_failure_rate = max_failure_rate
+        # Other proxies to try when a fetch fails, before giving up
+        self.failover = failover
+        self._proxies = [_Proxy(url) for url in dict.fromkeys(urls)]
+        self._lock = threading.Lock()
+
+    @property
+    def urls(self) -> list[str]:
+        return [proxy.url for proxy in self._proxies]
+
+    def _cost(self, proxy: _Proxy, default_latency: float) -> float:
+        latency = proxy.latency if proxy.latency is not None else default_latency
+        success = max((1 - proxy.error_rate) * (1 - proxy.block_rate), _MIN_SUCCESS)
+        return latency * (1 + proxy.in_flight) / success
+
+    def _available(self, now: float, exclude) -> list[_Proxy]:
+        return [proxy for proxy in self._proxies if proxy.quarantined_until <= now and proxy.url not in exclude]
+
+    def acquire(self, exclude=()) -> ProxyLease:
+        """
+        The healthiest proxy not in `exclude`. If all are quarantined, the one
+        whose quarantine ends first, so the run slows down rather than stops.
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = self._available(now, exclude)
+            if candidates:
+                known = [proxy.latency for proxy in self._proxies if proxy.latency is not None]
+                # Untried proxies are assumed to be average, so they get their share right away
+                default_latency = sum(known) / len(known) if known else 1.0
+                proxy = min(candidates, key=lambda proxy: self._cost(proxy, default_latency))
+            else:
+                others = [proxy for proxy in self._proxies if proxy.url not in exclude] or self._proxies
+                proxy = min(others, key=lambda proxy: proxy.quarantined_until)
+            proxy.in_flight += 1
+        return ProxyLease(proxy.url)
+
+    def release(self, lease: ProxyLease, error: bool = False, blocked: bool = False):
+        """Records the outcome of the request made through `lease`."""
+        seconds = time.monotonic() - lease.started
+        outcome = "error" if error else "blocked" if blocked else "ok"
+        get_metrics().inc("proxy_requests_total", proxy=proxy_label(lease.url), outcome=outcome)
+        with self._lock:
+            proxy = next(proxy for proxy in self._proxies if proxy.url == lease.url)
+            proxy.in_flight -= 1
+            proxy.requests += 1
+            proxy.errors += error
+            proxy.blocks += blocked
+            proxy.error_rate = _ALPHA * error + (1 - _ALPHA) * proxy.error_rate
+            if not error:
+                proxy.block_rate = _ALPHA * blocked + (1 - _ALPHA) * proxy.block_rate
+                proxy.latency = seconds if proxy.latency is None else _ALPHA * seconds + (1 - _ALPHA) * proxy.latency
+
+            failure_rate = max(proxy.error_rate, proxy.block_rate)
+            if failure_rate < self.max_failure_rate / 2:
+                proxy.strikes = 0
+            elif failure_rate > self.max_failure_rate and proxy.quarantined_until <= time.monotonic():
+                self._quarantine(proxy)
+
+    def _quarantine(self, proxy: _Proxy):
+        proxy.strikes += 1
+        proxy.quarantines += 1
+        seconds = min(self.quarantine_seconds * 2 ** (proxy.strikes - 1), self.max_quarantine_seconds)
+        proxy.quarantined_until = time.monotonic() + seconds
+        logger.warning(
+            f"Quarantining proxy {proxy.label} for {seconds:.0f}s "
+            f"(errors {proxy.error_rate:.0%}, bot checks {proxy.block_rate:.0%})"
+        )
+        get_metrics().inc("proxy_quarantines_total", proxy=proxy.label)
+        # On probation when it comes back: one more failure passes the threshold again
+        probation = self.max_failure_rate * (1 - _ALPHA / 2)
+        proxy.error_rate = min(proxy.error_rate, probation)
+        proxy.block_rate = min(proxy.block_rate, probation)
+
+    def can_fail_over(self, tried: list[str]) -> bool:
+        """Whether a fetch that failed through the proxies in `tried` should try another one."""
+        with self._lock:
+            return len(tried) <= self.failover and bool(self._available(time.monotonic(), tried))
+
+    def summary(self) -> list[str]:
+        now = time.monotonic()
+        lines = []
+        with self._lock:
+            for proxy in self._proxies:
+                latency = f"{proxy.latency * 1000:.0f}ms" if proxy.latency is not None else "-"
+                state = f", quarantined for {proxy.quarantined_until - now:.0f}s" if proxy.quarantined_until > now else ""
+                lines.append(
+                    f"Proxy {proxy.label}: {proxy.requests} requests, {proxy.errors} errors, "
+                    f"{proxy.blocks} bot checks, latency {latency}, {proxy.quarantines} quarantines{state}"
+                )
+        return lines
+
+
+def new_proxy_pool(urls: list[str]) -> ProxyPool:
+    """A pool of `urls`, configured by `config.proxy_pool`."""
+    pool_config = getattr(config, "proxy_pool", SimpleNamespace())
+    return ProxyPool(urls, **vars(pool_config))
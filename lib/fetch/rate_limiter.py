@@ -0,0 +1,153 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from lib.config import get_config
+from lib.logger import get_logger
+
+config = get_config()
+logger = get_logger("rate_limiter")
+
+
+class _Slot:
+    """Handed to the caller of `RateLimiter.slot`; set `blocked` if the response was a block page."""
+
+    def __init__(self):
+        self.blocked = False
+
+
+class _HostBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.last_decrease = 0.0
+
+        self.requests = 0
+        self.throttle_events = 0
+        self.wait_seconds = 0.0
+
+
+class RateLimiter:
+    """
+    Token bucket per host with AIMD rate control.
+
+    Every clean response raises the host's rate by `increase` requests/s (up to
+    `max_rate`); a non-200, timeout or bot check multiplies it by `decrease`
+    (down to `min_rate`). Failures that arrive together count as one event, so
+    a burst of concurrent errors doesn't collapse the rate to the minimum.
+    """
+
+    def __init__(
+        self,
+        initial_rate: float = 5.0,
+        min_rate: float = 0.2,
+        max_rate: float = 50.0,
+        increase: float = 0.1,
+        decrease: float = 0.5,
+        burst: float = 1.0,
+        enabled: bool = True,
+    ):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.burst = burst
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._buckets: dict[str, _HostBucket] = {}
+
+    def _bucket(self, host: str) -> _HostBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = _HostBucket(self.initial_rate, self.burst)
+        return bucket
+
+    def _reserve(self, url: str) -> float:
+        """Takes a token for the host of `url` and returns how long to wait before using it."""
+        if not self.enabled:
+            return 0.0
+        host = urlsplit(url).netloc
+        with self._lock:
+            bucket = self._bucket(host)
+            now = time.monotonic()
+            bucket.tokens = min(bucket.burst, bucket.tokens + (now - bucket.updated) * bucket.rate)
+            bucket.updated = now
+            bucket.tokens -= 1
+            bucket.requests += 1
+            wait = -bucket.tokens / bucket.rate if bucket.tokens < 0 else 0.0
+            bucket.wait_seconds += wait
+        return wait
+
+    def acquire(self, url: str):
+        wait = self._reserve(url)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, url: str):
+        wait = self._reserve(url)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def report(self, url: str, ok: bool):
+        if not self.enabled:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            bucket = self._bucket(host)
+            if ok:
+                bucket.rate = min(self.max_rate, bucket.rate + self.increase)
+                return
+
+            now = time.monotonic()
+            if now - bucket.last_decrease < 1 / bucket.rate:
+                return
+            bucket.last_decrease = now
+            bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+            bucket.throttle_events += 1
+            rate = bucket.rate
+        logger.info(f"Throttling {host} to {rate:.2f} req/s")
+
+    @contextmanager
+    def slot(self, url: str):
+        """Waits for a token, then reports the outcome of the request made inside the block."""
+        self.acquire(url)
+        slot = _Slot()
+        try:
+            yield slot
+        except Exception:
+            self.report(url, ok=False)
+            raise
+        self.report(url, ok=not slot.blocked)
+
+    @asynccontextmanager
+    async def slot_async(self, url: str):
+        await self.acquire_async(url)
+        slot = _Slot()
+        try:
+            yield slot
+        except Exception:
+            self.report(url, ok=False)
+            raise
+        self.report(url, ok=not slot.blocked)
+
+    def summary(self) -> list[str]:
+        with self._lock:
+            return [
+                f"Rate limit {host}: {bucket.rate:.2f} req/s, {bucket.requests} requests, "
+                f"{bucket.throttle_events} throttle events, waited {bucket.wait_seconds:.1f}s"
+                for host, bucket in self._buckets.items()
+            ]
+
+
+@lru_cache(maxsize=1)
+def get_rate_limiter() -> RateLimiter:
+    """The limiter shared by all fetchers of the process, configured by `config.rate_limit`."""
+    rate_config = getattr(config, "rate_limit", SimpleNamespace())
+    return RateLimiter(**vars(rate_config))
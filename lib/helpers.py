@@ -1,31 +1,25 @@
+import zoneinfo
+from datetime import datetime
 from lib.logger import get_logger
 
 logger = get_logger("helpers")
 
+berlin_tz = zoneinfo.ZoneInfo("Europe/Berlin")
 
-def has_bot_detection(html: str, keywords: list[str] | None = None) -> bool:
-    """
-    Return True if the HTML indicates that a bot / captcha verification
-    page was shown instead of the real content.
-
-    Detection is done via simple case-insensitive keyword search.
-    """
-    default_keywords = [
-        "ich bin kein roboter",   # German reCAPTCHA text
-        "i am not a robot",
-        "i’m not a robot",
-        "captcha",
-        "unusual traffic",
-        "verify you are a human",
-        "verify that you are human",
-    ]
 
-    patterns = keywords or default_keywords
-    text = html.lower()
+def as_berlin(value: datetime | None) -> datetime | None:
+    """Makes naive values Berlin time, so a list of timestamps can be sent as one timestamptz array."""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=berlin_tz)
+    return value
 
-    for phrase in patterns:
-        if phrase.lower() in text:
-            logger.info(f"Bot detection pattern found in HTML: {phrase!r}")
-            return True
 
-    return False
\ No newline at end of file
+def to_epoch(value: datetime | None) -> int:
+    """
+    Seconds since the epoch, so timestamps from the portals and from the DB
+    compare equal regardless of their timezone. Naive values are taken as
+    Berlin time (like the timestamps we write), None becomes 0.
+    """
+    if value is None:
+        return 0
+    return int(as_berlin(value).timestamp())
@@ -0,0 +1,217 @@
+import hashlib
+import struct
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from types import SimpleNamespace
+
+from lib.config import BASE_DIR, get_config
+from lib.helpers import to_epoch
+from lib.logger import get_logger
+from lib.models import ListingSource, NewListing
+
+config = get_config()
+logger = get_logger("listing_index")
+
+_MAGIC = b"LSTIDX02"
+_HEADER = struct.Struct("<8sqqd")  # magic, count, capacity, built_at
+_MAX_LOAD = 0.7
+
+
+def _key(external_id: str) -> int:
+    key = int.from_bytes(hashlib.blake2b(external_id.encode(), digest_size=8).digest(), "little", signed=True)
+    return key or 1  # 0 marks an empty slot
+
+
+class ListingIndex:
+    """
+    Compact map of external_id -> modified_at (epoch seconds) for one source.
+
+    An open-addressing hash table over two int64 arrays: the 64-bit hash of the
+    external id and the timestamp. That is about 23 bytes per listing at the
+    maximum load factor, so a few million listings stay well below 100 MB,
+    where a dict of strings and datetimes would need several hundred.
+
+    Listings queued for the write-behind writer are kept aside as pending
+    until their batch is written: they count as known, so other pages don't
+    queue them again, but only enter the table (and the snapshot) once they
+    are stored, and are dropped if the write fails.
+
+    `built_at` is when the index was last read from the database. Snapshots
+    keep it, so listings written by other processes are picked up at the
+    latest `max_age` after that, however often the snapshot is saved.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        size = 1 << max(capacity - 1, 1).bit_length()
+        self._keys = array("q", bytes(8 * size))
+        self._values = array("q", bytes(8 * size))
+        self._mask = size - 1
+        self._count = 0
+        self._lock = threading.Lock()
+        self.built_at = time.time()
+        # key -> modified_at of listings that are queued to be written
+        self._pending: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _slot(self, key: int) -> int:
+        keys, mask = self._keys, self._mask
+        i = key & mask
+        while True:
+            k = keys[i]
+            if k == key or k == 0:
+                return i
+            i = (i + 1) & mask
+
+    def _grow(self):
+        keys, values = self._keys, self._values
+        size = 2 * len(keys)
+        self._keys = array("q", bytes(8 * size))
+        self._values = array("q", bytes(8 * size))
+        self._mask = size - 1
+        for key, value in zip(keys, values):
+            if key:
+                i = self._slot(key)
+                self._keys[i] = key
+                self._values[i] = value
+
+    def _put(self, key: int, value: int):
+        i = self._slot(key)
+        if self._keys[i] == 0:
+            self._count += 1
+            self._keys[i] = key
+            if self._count > _MAX_LOAD * len(self._keys):
+                self._grow()
+                i = self._slot(key)
+        self._values[i] = value
+
+    def add(self, external_id: str, modified_at) -> None:
+        with self._lock:
+            self._put(_key(external_id), to_epoch(modified_at))
+
+    def update(self, listings: Iterable[NewListing]) -> None:
+        """Adds listings that are written to the DB."""
+        with self._lock:
+            for listing in listings:
+                key, value = _key(listing.external_id), to_epoch(listing.modified_at)
+                self._put(key, value)
+                if self._pending.get(key) == value:
+                    del self._pending[key]
+
+    def add_pending(self, listings: Iterable[NewListing]) -> None:
+        """Marks listings as queued to be written, see `update` and `discard_pending`."""
+        with self._lock:
+            for listing in listings:
+                self._pending[_key(listing.external_id)] = to_epoch(listing.modified_at)
+
+    def discard_pending(self, listings: Iterable[NewListing]) -> None:
+        """Forgets queued listings whose write failed, so the next page that shows them writes them again."""
+        with self._lock:
+            for listing in listings:
+                key = _key(listing.external_id)
+                if self._pending.get(key) == to_epoch(listing.modified_at):
+                    del self._pending[key]
+
+    def is_unchanged(self, listing: NewListing) -> bool:
+        """True if the listing is known (or queued to be written) with the same modified_at."""
+        key, value = _key(listing.external_id), to_epoch(listing.modified_at)
+        with self._lock:
+            if self._pending.get(key) == value:
+                return True
+            i = self._slot(key)
+            return self._keys[i] != 0 and self._values[i] == value
+
+    # --- Snapshots ---
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with self._lock, tmp_path.open("wb") as f:
+            f.write(_HEADER.pack(_MAGIC, self._count, len(self._keys), self.built_at))
+            self._keys.tofile(f)
+            self._values.tofile(f)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path, max_age: float) -> "ListingIndex | None":
+        """
+        Reads a snapshot written by `save`, or returns None if there is none
+        built less than `max_age` seconds ago. Raises ValueError if the file is
+        truncated or corrupt.
+        """
+        if not path.exists():
+            return None
+        with path.open("rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                raise ValueError("truncated header")
+            magic, count, capacity, built_at = _HEADER.unpack(header)
+            if magic != _MAGIC:
+                logger.warning(f"Ignoring listing index snapshot {path}: unknown format")
+                return None
+            # The table size must be a power of two for the slot mask, and the body hold both arrays
+            if capacity <= 0 or capacity & (capacity - 1) or not 0 <= count <= capacity:
+                raise ValueError(f"invalid header (count {count}, capacity {capacity})")
+            if path.stat().st_size != _HEADER.size + 16 * capacity:
+                raise ValueError(f"{path.stat().st_size} bytes, expected {_HEADER.size + 16 * capacity}")
+            if time.time() - built_at > max_age:
+                logger.info(f"Ignoring listing index snapshot {path}: built more than {max_age / 3600:.0f}h ago")
+                return None
+            index = cls(1)
+            index._keys = array("q")
+            index._keys.fromfile(f, capacity)
+            index._values = array("q")
+            index._values.fromfile(f, capacity)
+            index._mask = capacity - 1
+            index._count = count
+            index.built_at = built_at
+        return index
+
+    @classmethod
+    def from_rows(cls, rows: Iterator[tuple[str, object]]) -> "ListingIndex":
+        # built_at is taken before the rows are read, changes made while streaming count as newer
+        index = cls()
+        for external_id, modified_at in rows:
+            index._put(_key(external_id), to_epoch(modified_at))
+        return index
+
+
+def _index_config():
+    return getattr(config, "listing_index", SimpleNamespace())
+
+
+def snapshot_path(source: ListingSource) -> Path:
+    snapshot_dir = getattr(_index_config(), "snapshot_dir", "cache")
+    return BASE_DIR / snapshot_dir / f"listing_index_{source.value}.bin"
+
+
+def load_listing_index(db, source: ListingSource) -> ListingIndex | None:
+    """
+    Loads the known listings of `source` from the local snapshot if they were
+    read from the DB less than `listing_index.max_age_hours` ago, otherwise
+    streams them from the DB.
+    Returns None if the index is disabled in the config.
+    """
+    index_config = _index_config()
+    if not getattr(index_config, "enabled", True):
+        return None
+
+    start = time.perf_counter()
+    max_age = getattr(index_config, "max_age_hours", 24) * 3600
+    path = snapshot_path(source)
+    try:
+        index = ListingIndex.load(path, max_age)
+    except Exception as e:
+        logger.warning(f"Ignoring listing index snapshot {path}: {e}")
+        index = None
+    origin = "snapshot"
+    if index is None:
+        index = ListingIndex.from_rows(db.stream_listing_modified_at(source))
+        origin = "database"
+    logger.info(f"Loaded {len(index)} known {source.value} listings from {origin} in {time.perf_counter() - start:.1f}s")
+    return index
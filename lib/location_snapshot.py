@@ -0,0 +1,76 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+
+from lib.config import BASE_DIR, get_config
+from lib.database import GET_KLEINANZEIGEN_IDS_BY_STATES_SQL
+from lib.logger import get_logger
+
+config = get_config()
+logger = get_logger("location_snapshot")
+
+
+def snapshot_path() -> Path:
+    """In `finder.locations.kleinanzeigen.snapshot_dir` (default cache/), with the rest of the crawl state."""
+    locations_config = getattr(config.finder.locations, "kleinanzeigen", None)
+    snapshot_dir = getattr(locations_config, "snapshot_dir", "cache")
+    return BASE_DIR / snapshot_dir / "kleinanzeigen_locations.json"
+
+
+def _version(states: list[str]) -> str:
+    """Changes with the configured states and with the query, so either invalidates the snapshot."""
+    key = json.dumps([sorted(states), GET_KLEINANZEIGEN_IDS_BY_STATES_SQL.as_string(None)])
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def _load(path: Path, version: str, max_age: float) -> list | None:
+    if not path.exists():
+        return None
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except ValueError:
+        logger.warning(f"Ignoring location snapshot {path}: not valid JSON")
+        return None
+    if data.get("version") != version:
+        logger.info(f"Ignoring location snapshot {path}: states or query changed")
+        return None
+    if time.time() - data["saved_at"] > max_age:
+        logger.info(f"Ignoring location snapshot {path}: older than {max_age / 3600:.0f}h")
+        return None
+    return data["ids"]
+
+
+def _save(path: Path, version: str, ids: list):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps({"version": version, "saved_at": time.time(), "ids": ids}), encoding="utf-8")
+    tmp_path.replace(path)
+
+
+def load_kleinanzeigen_ids(db, states: list[str], max_age: float, path: Path | None = None) -> list:
+    """
+    Kleinanzeigen location ids of `states`, from the local snapshot if it is
+    younger than `max_age` seconds and was taken for the same states, else
+    with one query and saved as the new snapshot.
+    """
+    if not states:
+        return []
+    path = path or snapshot_path()
+    version = _version(states)
+    ids = _load(path, version, max_age)
+    if ids is not None:
+        logger.info(f"Loaded {len(ids)} Kleinanzeigen location ids of {len(states)} states from snapshot")
+        return ids
+
+    start = time.perf_counter()
+    ids = db.get_kleinanzeigen_ids_by_states(states)
+    logger.info(
+        f"Loaded {len(ids)} Kleinanzeigen location ids of {len(states)} states from database "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    try:
+        _save(path, version, ids)
+    except Exception as e:
+        logger.warning(f"Could not save location snapshot: {e}")
+    return ids
@@ -0,0 +1,149 @@
+import json
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import SimpleNamespace
+
+from lib.config import BASE_DIR, get_config
+from lib.logger import get_logger
+from lib.models import ListingSource
+
+config = get_config()
+logger = get_logger("location_stats")
+
+# Weight of the newest visit in the moving averages
+_ALPHA = 0.3
+
+
+@dataclass
+class Plan:
+    units: list[tuple]
+    low_yield: int = 0
+    over_budget: int = 0
+    expected_listings: float = 0.0
+    expected_requests: float = 0.0
+
+    def summary(self, total: int) -> str:
+        return (
+            f"Planned {len(self.units)} of {total} locations ({self.low_yield} low yield, "
+            f"{self.over_budget} over budget): ~{self.expected_listings:.0f} new listings "
+            f"in ~{self.expected_requests:.0f} requests"
+        )
+
+
+class LocationStats:
+    """
+    What visiting each (category, location) brought: a moving average of new
+    or changed listings per hour since the previous visit, of requests per
+    visit, the last pages count and the time of the last visit.
+
+    `plan` orders the locations by the listings expected to have appeared
+    since their last visit per request, skips the ones not expected to have
+    any (until `max_interval_hours` have passed) and stops at a request budget.
+
+    A visit less than `min_interval_hours` after the last one (a quick rerun,
+    a resumed run) is too short to measure a rate: its listings are carried
+    over to the next visit, which measures from the last one.
+    """
+
+    def __init__(self, path: Path, min_interval_hours: float = 6):
+        self.path = path
+        self.min_interval_hours = min_interval_hours
+        # category -> location -> {"visits", "last_visit", "rate", "requests", "pages_count", "carried"}
+        self._units: dict[str, dict[str, dict]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, category, location) -> dict | None:
+        return self._units.get(str(category), {}).get(str(location))
+
+    def record_visit(self, category, location, changed: int, requests: int, pages_count: int):
+        now = time.time()
+        with self._lock:
+            unit = self._units.setdefault(str(category), {}).get(str(location))
+            if unit is None:
+                # The first visit finds everything; the rate is known from the second one
+                self._units[str(category)][str(location)] = {
+                    "visits": 1, "last_visit": now, "rate": None, "requests": requests, "pages_count": pages_count
+                }
+                return
+            hours = (now - unit["last_visit"]) / 3600
+            if hours < self.min_interval_hours:
+                unit["carried"] = unit.get("carried", 0) + changed
+                return
+            rate = (changed + unit.pop("carried", 0)) / hours
+            unit["rate"] = rate if unit["rate"] is None else _ALPHA * rate + (1 - _ALPHA) * unit["rate"]
+            unit["requests"] = _ALPHA * requests + (1 - _ALPHA) * unit["requests"]
+            unit["visits"] += 1
+            unit["last_visit"] = now
+            unit["pages_count"] = pages_count
+
+    def plan(
+        self,
+        units: list[tuple],
+        budget: float | None = None,
+        min_expected: float = 0.5,
+        max_interval_hours: float = 168,
+    ) -> Plan:
+        now = time.time()
+        candidates, low_yield = [], 0
+        with self._lock:
+            for unit in units:
+                stats = self._get(*unit)
+                if stats is None or stats["rate"] is None:
+                    # Never visited twice: no estimate yet, so visit it first
+                    candidates.append((float("inf"), 0.0, (stats or {}).get("requests", 1), unit))
+                    continue
+                hours = (now - stats["last_visit"]) / 3600
+                expected = stats["rate"] * hours
+                if expected < min_expected and hours < max_interval_hours:
+                    low_yield += 1
+                    continue
+                requests = max(stats["requests"], 1)
+                candidates.append((expected / requests, expected, requests, unit))
+
+        # Stable sort: equal scores keep the configured order
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        plan = Plan([], low_yield=low_yield)
+        for _, expected, requests, unit in candidates:
+            if budget is not None and plan.expected_requests + requests > budget and plan.units:
+                plan.over_budget += 1
+                continue
+            plan.units.append(unit)
+            plan.expected_listings += expected
+            plan.expected_requests += requests
+        return plan
+
+    # --- File ---
+
+    def save(self):
+        with self._lock:
+            data = json.dumps({"saved_at": time.time(), "units": self._units})
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(data, encoding="utf-8")
+        tmp_path.replace(self.path)
+
+    @classmethod
+    def load(cls, path: Path, min_interval_hours: float = 6) -> "LocationStats":
+        stats = cls(path, min_interval_hours)
+        if path.exists():
+            stats._units = json.loads(path.read_text(encoding="utf-8"))["units"]
+        return stats
+
+
+def _stats_config():
+    return getattr(config, "location_stats", SimpleNamespace())
+
+
+def location_stats_path(source: ListingSource) -> Path:
+    stats_dir = getattr(_stats_config(), "dir", "cache")
+    return BASE_DIR / stats_dir / f"location_stats_{source.value}.json"
+
+
+def load_location_stats(source: ListingSource) -> LocationStats | None:
+    """The location statistics of `source`, or None unless `location_stats.enabled` is set in the config."""
+    stats_config = _stats_config()
+    if not getattr(stats_config, "enabled", False):
+        return None
+    return LocationStats.load(location_stats_path(source), getattr(stats_config, "min_interval_hours", 6))
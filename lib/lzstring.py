@@ -0,0 +1,113 @@
+"""
+Decoder for LZString's Base64 format (`LZString.compressToBase64` in JS),
+which Immowelt uses for the `classified-serp-init-data` payload.
+
+Gives the same output as `lzstring.LZString.decompressFromBase64`, which reads
+the stream one bit at a time through a lambda and dict lookups. Here the
+input is mapped to 6-bit values with one `bytes.translate`, the bits are
+read a whole code at a time from an integer buffer, and the dictionary is a
+list indexed by code.
+"""
+
+_KEY_STR_BASE64 = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+
+
+def _reversed_bits(value: int) -> int:
+    """The 6 bits of `value` in reverse order: LZString reads each character from its high bit down."""
+    return int(f"{value & 0b111111:06b}"[::-1], 2)
+
+
+# Base64 character -> its bits in reading order, 0xFF for characters outside the alphabet.
+# "=" is 64 and only its 6 low bits (all zero) are read, like in the reference implementation.
+_BASE64_BITS = bytes(
+    _reversed_bits(_KEY_STR_BASE64.index(chr(i))) if chr(i) in _KEY_STR_BASE64 else 0xFF for i in range(256)
+)
+
+
+class _Truncated(Exception):
+    pass
+
+
+def decompress_from_base64(compressed: str | None) -> str | None:
+    """
+    Decompresses LZString Base64 data. Mirrors the reference implementation:
+    "" for None, None for an empty string or a corrupt stream. Data that ends
+    (or hits a character outside the alphabet) before the end marker gives "",
+    where the reference raises.
+    """
+    if compressed is None:
+        return ""
+    if compressed == "":
+        return None
+    data = compressed.encode("ascii", "replace").translate(_BASE64_BITS)
+    # Like the reference, which reads lazily, characters after the end marker
+    # don't matter (the Immowelt payload is cut out with a trailing backslash)
+    invalid = data.find(0xFF)
+    if invalid != -1:
+        data = data[:invalid]
+
+    length = len(data)
+    position = 0
+    buffer = 0
+    buffered = 0
+
+    def read(bits: int) -> int:
+        # The stream is little-endian in reading order: earlier characters
+        # sit in the low bits of the buffer, the first bit read is bit 0
+        nonlocal position, buffer, buffered
+        while buffered < bits:
+            if position >= length:
+                raise _Truncated
+            buffer |= data[position] << buffered
+            position += 1
+            buffered += 6
+        value = buffer & ((1 << bits) - 1)
+        buffer >>= bits
+        buffered -= bits
+        return value
+
+    try:
+        kind = read(2)
+        if kind == 2:
+            return ""
+        if kind == 3:
+            return None
+        first = chr(read(8 if kind == 0 else 16))
+
+        # Codes 0-2 are control codes, not dictionary entries
+        dictionary = ["", "", "", first]
+        result = [first]
+        previous = first
+        num_bits = 3
+        enlarge_in = 4
+
+        while True:
+            code = read(num_bits)
+            if code < 2:
+                dictionary.append(chr(read(8 if code == 0 else 16)))
+                code = len(dictionary) - 1
+                enlarge_in -= 1
+            elif code == 2:
+                return "".join(result)
+
+            if enlarge_in == 0:
+                enlarge_in = 1 << num_bits
+                num_bits += 1
+
+            if code < len(dictionary):
+                entry = dictionary[code]
+            elif code == len(dictionary):
+                entry = previous + previous[0]
+            else:
+                return None
+            result.append(entry)
+
+            dictionary.append(previous + entry[0])
+            enlarge_in -= 1
+            previous = entry
+
+            if enlarge_in == 0:
+                enlarge_in = 1 << num_bits
+                num_bits += 1
+    except _Truncated:
+        return ""
@@ -0,0 +1,188 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from types import SimpleNamespace
+
+from lib.config import BASE_DIR, get_config
+
+config = get_config()
+
+# Upper bounds in seconds, from a parsed page (ms) to a browser page load with retries (minutes)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _label_key(labels: dict) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _label_text(key: LabelKey, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate of the q-quantile, interpolated within its bucket like Prometheus' histogram_quantile."""
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(BUCKETS, self.counts):
+            if count and seen + count >= rank:
+                return min(lower + (bound - lower) * (rank - seen) / count, self.max)
+            seen += count
+            lower = bound
+        return self.max
+
+
+class Metrics:
+    """
+    Counters and latency histograms of a run, keyed by name and labels.
+
+    Thread-safe and cheap enough for every page. At the end of a run `write`
+    dumps everything as JSON and in the Prometheus text format, so stages can
+    be compared and trended across runs.
+    """
+
+    def __init__(self, prefix: str = "finder"):
+        self.prefix = prefix
+        self.started = datetime.now(timezone.utc)
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[LabelKey, float]] = {}
+        self._histograms: dict[str, dict[LabelKey, _Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observes the duration of the block in `name`, also if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    # --- Reports ---
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "started_at": self.started.isoformat(),
+                "finished_at": datetime.now(timezone.utc).isoformat(),
+                "counters": {
+                    name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                    for name, series in self._counters.items()
+                },
+                "histograms": {
+                    name: [
+                        {
+                            "labels": dict(key),
+                            "count": h.count,
+                            "sum": h.sum,
+                            "max": h.max,
+                            "p50": h.quantile(0.5),
+                            "p95": h.quantile(0.95),
+                            "p99": h.quantile(0.99),
+                            "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], h.counts)),
+                        }
+                        for key, h in series.items()
+                    ]
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {metric} counter")
+                for key, value in series.items():
+                    lines.append(f"{metric}{_label_text(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for key, h in series.items():
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS, h.counts):
+                        cumulative += count
+                        le = _label_text(key, f'le="{bound}"')
+                        lines.append(f"{metric}_bucket{le} {cumulative}")
+                    le = _label_text(key, 'le="+Inf"')
+                    lines.append(f"{metric}_bucket{le} {h.count}")
+                    lines.append(f"{metric}_sum{_label_text(key)} {h.sum:.6f}")
+                    lines.append(f"{metric}_count{_label_text(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> list[str]:
+        """One line per timed stage, slowest total first, for the run log."""
+        with self._lock:
+            rows = [
+                (h.sum, f"{name}{_label_text(key)}", h)
+                for name, series in self._histograms.items()
+                for key, h in series.items()
+            ]
+        return [
+            f"{label}: {h.count} x, total {total:.1f}s, p50 {h.quantile(0.5) * 1000:.0f}ms, "
+            f"p95 {h.quantile(0.95) * 1000:.0f}ms, max {h.max * 1000:.0f}ms"
+            for total, label, h in sorted(rows, key=lambda row: row[0], reverse=True)
+        ]
+
+    def write(self, name: str) -> Path | None:
+        """Writes `<name>-<timestamp>.json` and `.prom` to the `metrics.dir` directory."""
+        metrics_config = getattr(config, "metrics", SimpleNamespace())
+        if not getattr(metrics_config, "enabled", True):
+            return None
+        directory = BASE_DIR / getattr(metrics_config, "dir", "artifacts")
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{name}-{self.started.strftime('%Y%m%dT%H%M%SZ')}"
+        path.with_suffix(".json").write_text(json.dumps(self.to_dict(), indent=2), encoding="utf-8")
+        path.with_suffix(".prom").write_text(self.to_prometheus(), encoding="utf-8")
+        return path
+
+
+@lru_cache(maxsize=1)
+def get_metrics() -> Metrics:
+    """The metrics of the process, shared by the fetchers, parsers and the database."""
+    return Metrics()
+
+
+def count_retries(backend: str, log_callback):
+    """tenacity `before_sleep` that counts the retry and then logs it like `log_callback`."""
+    def before_sleep(retry_state):
+        get_metrics().inc("retries_total", backend=backend)
+        log_callback(retry_state)
+    return before_sleep
@@ -0,0 +1,245 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+from inspect import iscoroutinefunction
+from pathlib import Path
+from types import SimpleNamespace
+
+from lib.config import BASE_DIR, get_config
+from lib.logger import get_logger
+
+config = get_config()
+logger = get_logger("profiling")
+
+MODES = ("cprofile", "sampling", "tracemalloc")
+
+
+def _profiling_config():
+    return getattr(config, "profiling", SimpleNamespace())
+
+
+def enabled_modes(value: str | None = None) -> list[str]:
+    """
+    Modes from `value`, else the FINDER_PROFILE env variable, else `profiling.mode`;
+    comma-separated, e.g. "cprofile,tracemalloc".
+    """
+    value = value or os.environ.get("FINDER_PROFILE") or getattr(_profiling_config(), "mode", "") or ""
+    modes = [mode.strip() for mode in value.split(",") if mode.strip()]
+    for mode in modes:
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode {mode!r}, expected one of {', '.join(MODES)}")
+    return modes
+
+
+# --- cProfile ---
+
+class _DeterministicProfile:
+    """
+    cProfile of everything run inside the block. From Python 3.12 one profile
+    sees all threads; before that each new thread gets its own profile, and
+    they are merged at the end.
+    """
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+        self._thread_profiles: list[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def _start_thread_profile(self, *args):
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        with self._lock:
+            self._thread_profiles.append(profile)
+        profile.enable()
+
+    def __enter__(self):
+        if sys.version_info < (3, 12):
+            threading.setprofile(self._start_thread_profile)
+        self._profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self._profile.disable()
+        if sys.version_info < (3, 12):
+            threading.setprofile(None)
+
+    def write(self, path: Path):
+        stats = pstats.Stats(self._profile)
+        with self._lock:
+            for profile in self._thread_profiles:
+                # Threads still running keep profiling, stats are a snapshot
+                profile.create_stats()
+                stats.add(profile)
+        stats.dump_stats(path.with_suffix(".pstats"))
+        stats.stream = text = io.StringIO()
+        stats.sort_stats("cumulative").print_stats(60)
+        path.with_suffix(".cprofile.txt").write_text(text.getvalue(), encoding="utf-8")
+
+
+# --- Sampling ---
+
+class _Sampler:
+    """
+    Samples the stacks of all threads every `interval` seconds from a
+    background thread. Cheap enough for a production crawl; the output is in
+    the collapsed format of flamegraph.pl / speedscope.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: Path):
+        lines = [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+        path.with_suffix(".folded").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+# --- tracemalloc ---
+
+class _AllocationTracker:
+    """
+    Traces allocations and snapshots them after every `every`-th page, so the
+    report shows what grew between the first and the last page and which
+    lines allocate the most.
+    """
+
+    def __init__(self, every: int, frames: int = 10):
+        self.every = every
+        self.frames = frames
+        self.pages = 0
+        self.first: tracemalloc.Snapshot | None = None
+        self.last: tracemalloc.Snapshot | None = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        tracemalloc.start(self.frames)
+        return self
+
+    def __exit__(self, *exc):
+        self.peak = tracemalloc.get_traced_memory()[1]
+        self.final = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+    def page_done(self):
+        with self._lock:
+            self.pages += 1
+            take = self.pages == 1 or self.pages % self.every == 0
+        if take:
+            snapshot = tracemalloc.take_snapshot()
+            with self._lock:
+                if self.first is None:
+                    self.first = snapshot
+                self.last = snapshot
+
+    def wrap(self, method):
+        """Wraps a page method of the finder, sync or async, to snapshot after it."""
+        if iscoroutinefunction(method):
+            @wraps(method)
+            async def wrapped_async(*args, **kwargs):
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    self.page_done()
+            return wrapped_async
+
+        @wraps(method)
+        def wrapped(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.page_done()
+        return wrapped
+
+    def write(self, path: Path, top: int = 30):
+        lines = [f"Pages: {self.pages}, peak traced memory: {self.peak / 1024 / 1024:.1f} MB", ""]
+        lines.append(f"Top {top} allocators at the end of the run:")
+        for stat in self.final.statistics("lineno")[:top]:
+            lines.append(f"  {stat}")
+        if self.first is not None and self.last is not None and self.last is not self.first:
+            lines += ["", f"Top {top} changes between the first and the last page snapshot:"]
+            for stat in self.last.compare_to(self.first, "lineno")[:top]:
+                lines.append(f"  {stat}")
+        path.with_suffix(".tracemalloc.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+@contextmanager
+def profile_run(name: str, finder=None, modes: str | None = None):
+    """
+    Profiles the block with `modes` or the ones switched on (see `enabled_modes`)
+    and writes the results to `profiling.dir` (default the artifacts directory):
+    `.pstats` + `.cprofile.txt`, `.folded` and `.tracemalloc.txt`. Does nothing
+    if no mode is on. With tracemalloc, the page methods of `finder` are
+    wrapped to take the snapshots.
+    """
+    modes = enabled_modes(modes)
+    if not modes:
+        yield
+        return
+
+    profiling_config = _profiling_config()
+    directory = BASE_DIR / getattr(profiling_config, "dir", "artifacts")
+    path = directory / f"{name}-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}"
+    profilers = []
+    logger.info(f"Profiling run with {', '.join(modes)}")
+
+    with ExitStack() as stack:
+        if "tracemalloc" in modes:
+            tracker = stack.enter_context(_AllocationTracker(getattr(profiling_config, "snapshot_every", 50)))
+            profilers.append(tracker)
+            if finder is not None:
+                for method_name in ("process_page_strategy", "process_page_async"):
+                    if hasattr(finder, method_name):
+                        setattr(finder, method_name, tracker.wrap(getattr(finder, method_name)))
+        if "sampling" in modes:
+            profilers.append(stack.enter_context(_Sampler(getattr(profiling_config, "interval", 0.01))))
+        if "cprofile" in modes:
+            profilers.append(stack.enter_context(_DeterministicProfile()))
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+
+    directory.mkdir(parents=True, exist_ok=True)
+    for profiler in profilers:
+        try:
+            profiler.write(path)
+        except Exception as e:
+            logger.warning(f"Could not write {type(profiler).__name__} output: {e}")
+    logger.info(f"Profiled {elapsed:.0f}s, output written to {path}.*")
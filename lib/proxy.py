@@ -19,6 +19,7 @@ class FirewallManager:
             self.credentials = service_account.Credentials.from_service_account_file(KEY_PATH)
             self.firewall_client = compute_v1.FirewallsClient(credentials=self.credentials)
             self._authorized = False # Track state
+            self._ports: set[int] = set()
         except Exception as e:
             logger.error(f"Failed to initialize GCP credentials: {e}")
             raise
@@ -30,16 +31,23 @@ class FirewallManager:
             logger.error(f"Could not determine public IP: {e}")
             raise
 
-    def authorize_current_ip(self):
-        """Adds current IP and automatically registers cleanup on exit."""
-        if self._authorized:
+    def authorize_current_ip(self, ports: list[int | None] | None = None):
+        """
+        Adds current IP and automatically registers cleanup on exit.
+        `ports` are the proxy ports to open (None entries mean PROXY_PORT).
+        """
+        ports = {port or PROXY_PORT for port in ports or [None]}
+        if self._authorized and ports <= self._ports:
             return
 
         my_ip = self.get_my_public_ip()
         logger.info(f"Authorizing IP: {my_ip}...")
         
         try:
-            self._add_ip_to_rule(my_ip)
+            self._add_ip_to_rule(my_ip, ports | self._ports)
+            self._ports |= ports
+            if self._authorized:
+                return
             self._authorized = True
             
             # 3. Register cleanup internally. 
@@ -74,21 +82,28 @@ class FirewallManager:
         except NotFound:
             return None
 
-    def _add_ip_to_rule(self, ip_address):
+    def _add_ip_to_rule(self, ip_address, ports: set[int]):
         existing_rule = self._get_existing_rule()
         new_range = f"{ip_address}/32"
+        new_ports = sorted(str(port) for port in ports)
 
         if existing_rule:
-            if new_range in existing_rule.source_ranges:
+            allowed_ports = {port for allowed in existing_rule.allowed for port in allowed.ports}
+            if new_range in existing_rule.source_ranges and allowed_ports.issuperset(new_ports):
                 return 
 
             updated_ranges = list(existing_rule.source_ranges)
-            updated_ranges.append(new_range)
+            if new_range not in updated_ranges:
+                updated_ranges.append(new_range)
+            updated_ports = sorted(allowed_ports | set(new_ports))
             
             op = self.firewall_client.patch(
                 project=PROJECT_ID,
                 firewall=FIREWALL_RULE_NAME,
-                firewall_resource=compute_v1.Firewall(source_ranges=updated_ranges)
+                firewall_resource=compute_v1.Firewall(
+                    source_ranges=updated_ranges,
+                    allowed=[compute_v1.Allowed(I_p_protocol="tcp", ports=updated_ports)],
+                )
             )
         else:
             firewall_resource = {
@@ -96,7 +111,7 @@ class FirewallManager:
                 "direction": "INGRESS",
                 "priority": 1000,
                 "network": "global/networks/default",
-                "allowed": [{"I_p_protocol": "tcp", "ports": [str(PROXY_PORT)]}],
+                "allowed": [{"I_p_protocol": "tcp", "ports": new_ports}],
                 "source_ranges": [new_range],
                 "target_tags": ["http-proxy-server"]
             }
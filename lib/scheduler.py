@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from lib.logger import get_logger
+
+logger = get_logger("scheduler")
+
+
+@dataclass
+class _Task:
+    host: str
+    fn: Callable[..., Any]
+    args: tuple = field(default_factory=tuple)
+
+
+class Scheduler:
+    """
+    Run-wide work queue served by one set of `max_workers` threads.
+
+    Every task is tagged with the host it talks to. A worker takes the first
+    queued task whose host is below its limit, so one slow or throttled host
+    does not block workers that could serve another. Tasks may submit further
+    tasks (e.g. page 1 enqueueing pages 2..n); `front=True` puts them ahead of
+    the queue so started locations finish before new ones are opened.
+    """
+
+    def __init__(self, max_workers: int, per_host_limit: int | None = None):
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit or max_workers
+        self._host_limits: dict[str, int] = {}
+        self._cond = threading.Condition()
+        self._queue: deque[_Task] = deque()
+        self._running: Counter[str] = Counter()
+        self._pending = 0
+        self._pending_by_host: Counter[str] = Counter()
+        self._closed = False
+        self._threads: list[threading.Thread] = []
+
+        self.started_at = 0.0
+        self.completed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.max_depth = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(cancel=exc_type is not None)
+
+    def start(self):
+        if self._threads:
+            return
+        self.started_at = time.perf_counter()
+        for i in range(self.max_workers):
+            thread = threading.Thread(target=self._work, name=f"scheduler-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def set_host_limit(self, host: str, limit: int):
+        with self._cond:
+            self._host_limits[host] = limit
+            self._cond.notify_all()
+
+    def submit(self, host: str, fn: Callable[..., Any], *args, front: bool = False):
+        self.submit_many(host, [(fn, *args)], front=front)
+
+    def submit_many(self, host: str, calls: list[tuple], front: bool = False):
+        """Queues `fn(*args)` for every `(fn, *args)` in `calls`, keeping their order."""
+        tasks = [_Task(host, call[0], tuple(call[1:])) for call in calls]
+        with self._cond:
+            if front:
+                self._queue.extendleft(reversed(tasks))
+            else:
+                self._queue.extend(tasks)
+            self._pending += len(tasks)
+            self._pending_by_host[host] += len(tasks)
+            self.max_depth = max(self.max_depth, len(self._queue))
+            self._cond.notify_all()
+
+    def join(self, report_every: float = 60, host: str | None = None):
+        """
+        Blocks until every submitted task (including follow-ups) is done, or
+        only every task of `host`, logging progress meanwhile.
+        """
+        next_report = time.perf_counter() + report_every
+        with self._cond:
+            while self._pending if host is None else self._pending_by_host[host]:
+                self._cond.wait(timeout=max(next_report - time.perf_counter(), 0))
+                if time.perf_counter() >= next_report:
+                    logger.info(
+                        f"Queue depth: {len(self._queue)}, running: {sum(self._running.values())}, "
+                        f"done: {self.completed}, utilisation: {self.utilisation:.0%}"
+                    )
+                    next_report += report_every
+
+    def shutdown(self, cancel: bool = False):
+        with self._cond:
+            if cancel:
+                self._pending -= len(self._queue)
+                for task in self._queue:
+                    self._pending_by_host[task.host] -= 1
+                self._queue.clear()
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def utilisation(self) -> float:
+        """Share of the worker time since start that was spent on tasks."""
+        elapsed = time.perf_counter() - self.started_at
+        return self.busy_seconds / (elapsed * self.max_workers) if elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"Scheduler: {self.completed} tasks ({self.failed} failed) on {self.max_workers} workers, "
+            f"utilisation {self.utilisation:.0%}, max queue depth {self.max_depth}"
+        )
+
+    def _next_task(self) -> _Task | None:
+        for i, task in enumerate(self._queue):
+            if self._running[task.host] < self._host_limits.get(task.host, self.per_host_limit):
+                del self._queue[i]
+                return task
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None:
+                    if self._closed:
+                        return
+                    self._cond.wait()
+                    task = self._next_task()
+                self._running[task.host] += 1
+
+            start = time.perf_counter()
+            failed = False
+            try:
+                task.fn(*task.args)
+            except Exception as e:
+                failed = True
+                logger.exception(f"Task {task.fn.__name__}{task.args} failed: {e}")
+            finally:
+                with self._cond:
+                    self._running[task.host] -= 1
+                    self._pending -= 1
+                    self._pending_by_host[task.host] -= 1
+                    self.completed += 1
+                    self.failed += failed
+                    self.busy_seconds += time.perf_counter() - start
+                    self._cond.notify_all()
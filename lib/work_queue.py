@@ -0,0 +1,189 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+from psycopg.sql import SQL, Identifier, Literal
+from psycopg_pool import ConnectionPool
+
+from lib.config import get_config
+from lib.database import db_operation_with_retry, get_pool
+from lib.logger import get_logger
+from lib.models import ListingSource
+
+config = get_config()
+
+# The table is created by migrations/crawl_queue.sql, not by the workers
+CRAWL_QUEUE_EXISTS_SQL = SQL("SELECT to_regclass({name}) IS NOT NULL AS present").format(
+    name=Literal("fixnflip_v2.crawl_queue")
+)
+
+SEED_CRAWL_QUEUE_SQL = SQL(
+    """
+    INSERT INTO {schema}.{table} (crawl_id, source, category, location)
+    SELECT %(crawl_id)s, %(source)s, category, location
+    FROM unnest(%(categories)s::text[], %(locations)s::text[]) WITH ORDINALITY AS t (category, location, n)
+    ORDER BY n
+    ON CONFLICT (crawl_id, source, category, location) DO NOTHING
+    """
+).format(schema=Identifier("fixnflip_v2"), table=Identifier("crawl_queue"))
+
+# Pending units, and leased ones whose worker stopped renewing the lease
+CLAIM_UNIT_SQL = SQL(
+    """
+    UPDATE {schema}.{table} q
+    SET status = 'leased', worker = %(worker)s, lease_until = now() + %(lease)s * interval '1 second',
+        attempts = q.attempts + 1
+    WHERE q.id = (
+        SELECT id FROM {schema}.{table}
+        WHERE crawl_id = %(crawl_id)s AND source = %(source)s AND attempts < %(max_attempts)s
+          AND (status = 'pending' OR (status = 'leased' AND lease_until < now()))
+        ORDER BY id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING q.category, q.location, q.attempts
+    """
+).format(schema=Identifier("fixnflip_v2"), table=Identifier("crawl_queue"))
+
+RENEW_LEASES_SQL = SQL(
+    """
+    UPDATE {schema}.{table}
+    SET lease_until = now() + %(lease)s * interval '1 second'
+    WHERE crawl_id = %(crawl_id)s AND source = %(source)s AND worker = %(worker)s AND status = 'leased'
+    """
+).format(schema=Identifier("fixnflip_v2"), table=Identifier("crawl_queue"))
+
+COMPLETE_UNIT_SQL = SQL(
+    """
+    UPDATE {schema}.{table}
+    SET status = 'done', finished_at = now(), lease_until = NULL
+    WHERE crawl_id = %(crawl_id)s AND source = %(source)s AND category = %(category)s AND location = %(location)s
+      AND worker = %(worker)s AND status = 'leased'
+    """
+).format(schema=Identifier("fixnflip_v2"), table=Identifier("crawl_queue"))
+
+# Units another worker may still finish: pending, leased, or expired with attempts left
+COUNT_OPEN_UNITS_SQL = SQL(
+    """
+    SELECT count(*) FILTER (WHERE status = 'pending' AND attempts < %(max_attempts)s) AS pending,
+           count(*) FILTER (
+               WHERE status = 'leased' AND worker <> %(worker)s
+                 AND (lease_until >= now() OR attempts < %(max_attempts)s)
+           ) AS leased
+    FROM {schema}.{table}
+    WHERE crawl_id = %(crawl_id)s AND source = %(source)s
+    """
+).format(schema=Identifier("fixnflip_v2"), table=Identifier("crawl_queue"))
+
+
+def _queue_config():
+    return getattr(config, "work_queue", SimpleNamespace())
+
+
+class WorkQueue:
+    """
+    (category, location) units of one crawl in a Postgres table, shared by any
+    number of finder processes or machines that run with the same `crawl_id`.
+
+    Every worker seeds the table with all units (idempotent) and claims one
+    unit at a time with `FOR UPDATE SKIP LOCKED`, so no unit is handed out
+    twice. A claim is a lease that a heartbeat thread renews while the worker
+    runs; the units of a worker that dies are claimed again once their lease
+    expires, up to `max_attempts` times.
+    """
+
+    def __init__(self, source: ListingSource, crawl_id: str, pool: ConnectionPool | None = None):
+        queue_config = _queue_config()
+        self.logger = get_logger(self.__class__.__name__)
+        self._pool = pool or get_pool()
+        self.source = source
+        self.crawl_id = crawl_id
+        self.worker = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lease = getattr(queue_config, "lease_seconds", 300)
+        self.heartbeat = getattr(queue_config, "heartbeat_seconds", self.lease / 3)
+        self.max_attempts = getattr(queue_config, "max_attempts", 3)
+        self.poll = getattr(queue_config, "poll_seconds", 10)
+        self.claimed = 0
+        self.completed = 0
+        self._stop = threading.Event()
+        self._heartbeat_thread: threading.Thread | None = None
+
+    def _params(self, **params) -> dict:
+        return {"crawl_id": self.crawl_id, "source": self.source.value, "worker": self.worker, **params}
+
+    @db_operation_with_retry
+    def _execute(self, query, params: dict, fetch: bool = False):
+        with self._pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                row = cursor.fetchone() if fetch else None
+            conn.commit()
+        return row
+
+    # --- Lifecycle ---
+
+    def start(self, units: list[tuple]):
+        """Adds the units of this crawl to the table and starts the heartbeat."""
+        if not self._execute(CRAWL_QUEUE_EXISTS_SQL, {}, fetch=True)["present"]:
+            raise RuntimeError("Table fixnflip_v2.crawl_queue does not exist, apply migrations/crawl_queue.sql first")
+        self._execute(
+            SEED_CRAWL_QUEUE_SQL,
+            self._params(
+                categories=[str(category) for category, _ in units],
+                locations=[str(location) for _, location in units],
+            ),
+        )
+        self._heartbeat_thread = threading.Thread(target=self._renew_leases, name="work-queue-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+        self.logger.info(f"Worker {self.worker} joined crawl {self.crawl_id} with {len(units)} units")
+
+    def close(self):
+        self._stop.set()
+        if self._heartbeat_thread:
+            self._heartbeat_thread.join()
+
+    def _renew_leases(self):
+        while not self._stop.wait(self.heartbeat):
+            try:
+                self._execute(RENEW_LEASES_SQL, self._params(lease=self.lease))
+            except Exception as e:
+                self.logger.warning(f"Could not renew leases: {e}")
+
+    # --- Units ---
+
+    def claim(self) -> tuple[str, str] | None:
+        """Leases the next unit that no live worker holds, or returns None if there is none right now."""
+        row = self._execute(
+            CLAIM_UNIT_SQL, self._params(lease=self.lease, max_attempts=self.max_attempts), fetch=True
+        )
+        if row is None:
+            return None
+        if row["attempts"] > 1:
+            self.logger.info(f"Took over {row['category']} / {row['location']} (attempt {row['attempts']})")
+        self.claimed += 1
+        return row["category"], row["location"]
+
+    def next_unit(self) -> tuple[str, str] | None:
+        """
+        The next unit to crawl. Waits while other workers still hold units,
+        as their leases may expire; returns None once the crawl is done.
+        """
+        while not self._stop.is_set():
+            unit = self.claim()
+            if unit is not None:
+                return unit
+            open_units = self._execute(COUNT_OPEN_UNITS_SQL, self._params(max_attempts=self.max_attempts), fetch=True)
+            if not open_units["pending"] and not open_units["leased"]:
+                return None
+            time.sleep(self.poll)
+        return None
+
+    def complete(self, category, location):
+        self._execute(COMPLETE_UNIT_SQL, self._params(category=str(category), location=str(location)))
+        self.completed += 1
+
+    def summary(self) -> str:
+        return f"Work queue {self.crawl_id}: worker {self.worker} claimed {self.claimed}, completed {self.completed} units"
@@ -0,0 +1,152 @@
+import queue
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Callable
+
+from lib.config import get_config
+from lib.database import Database
+from lib.logger import get_logger
+from lib.models import ListingSource, NewListing
+
+config = get_config()
+logger = get_logger("writer")
+
+_STOP = object()
+
+# Called by the writer thread once the listings handed over with it are
+# flushed: with None, or with the error if writing their batch failed
+OnWritten = Callable[[Exception | None], None]
+
+
+class ListingWriter:
+    """
+    Write-behind stage between the page workers and Postgres.
+
+    Workers `put` the listings of a page into a bounded queue and move on; one
+    writer thread collects them and flushes a batch once it holds `batch_size`
+    listings or `flush_interval` seconds have passed, through
+    `Database.bulk_upsert_listings` (COPY + set-based merges). A full queue
+    blocks the workers, so a slow database throttles the crawl instead of
+    piling up memory. `close` flushes what is left.
+
+    The `on_written` callbacks of `put` and `touch` tell the caller whether its
+    listings are actually stored, since a failed batch is only logged here.
+    """
+
+    def __init__(self, db: Database, batch_size: int | None = None, flush_interval: float | None = None):
+        writer_config = getattr(config.database, "writer", SimpleNamespace())
+        self.db = db
+        self.batch_size = batch_size or getattr(writer_config, "batch_size", 1000)
+        self.flush_interval = flush_interval or getattr(writer_config, "flush_interval", 5)
+        self._queue: queue.Queue = queue.Queue(maxsize=getattr(writer_config, "queue_size", 200))
+        self._thread: threading.Thread | None = None
+
+        self.batches = 0
+        self.written = 0
+        self.touched = 0
+        self.failed = 0
+        self.flush_seconds = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="listing-writer", daemon=True)
+            self._thread.start()
+
+    def put(self, listings: list[NewListing], on_written: OnWritten | None = None):
+        """Queues new or changed listings for the full upsert."""
+        if listings:
+            self._queue.put(("upsert", (listings, on_written)))
+
+    def touch(self, source: ListingSource, external_ids: list[str], on_written: OnWritten | None = None):
+        """Queues unchanged listings that only need their last_seen_at refreshed."""
+        if external_ids:
+            self._queue.put(("touch", (source, external_ids, on_written)))
+
+    def close(self):
+        """Flushes everything that is queued and stops the writer thread."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def summary(self) -> str:
+        return (
+            f"Writer: {self.written} listings upserted and {self.touched} touched in {self.batches} batches "
+            f"({self.flush_seconds:.1f}s), {self.failed} failed"
+        )
+
+    def _run(self):
+        upserts: list[NewListing] = []
+        touches: dict[ListingSource, list[str]] = defaultdict(list)
+        # "upsert" or the source of the touches -> their on_written callbacks
+        callbacks: dict[object, list[OnWritten]] = defaultdict(list)
+        deadline = time.monotonic() + self.flush_interval
+        stopping = False
+
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                stopping = True
+            elif item is not None:
+                kind, payload = item
+                if kind == "upsert":
+                    listings, on_written = payload
+                    upserts.extend(listings)
+                    key = "upsert"
+                else:
+                    source, external_ids, on_written = payload
+                    touches[source].extend(external_ids)
+                    key = source
+                if on_written:
+                    callbacks[key].append(on_written)
+
+            pending = len(upserts) + sum(len(ids) for ids in touches.values())
+            if stopping or pending >= self.batch_size or time.monotonic() >= deadline:
+                if pending:
+                    self._flush(upserts, touches, callbacks)
+                upserts, touches, callbacks = [], defaultdict(list), defaultdict(list)
+                deadline = time.monotonic() + self.flush_interval
+
+    def _flush(
+        self,
+        upserts: list[NewListing],
+        touches: dict[ListingSource, list[str]],
+        callbacks: dict[object, list[OnWritten]],
+    ):
+        start = time.perf_counter()
+        if upserts:
+            error = None
+            try:
+                self.db.bulk_upsert_listings(upserts)
+                self.written += len(upserts)
+            except Exception as e:
+                error = e
+                self.failed += len(upserts)
+                logger.error(f"Failed to write batch of {len(upserts)} listings: {e}")
+            self._notify(callbacks["upsert"], error)
+        for source, external_ids in touches.items():
+            error = None
+            try:
+                self.db.touch_listings(source, external_ids)
+                self.touched += len(external_ids)
+            except Exception as e:
+                error = e
+                self.failed += len(external_ids)
+                logger.error(f"Failed to touch {len(external_ids)} {source.value} listings: {e}")
+            self._notify(callbacks[source], error)
+        self.batches += 1
+        self.flush_seconds += time.perf_counter() - start
+
+    def _notify(self, callbacks: list[OnWritten], error: Exception | None):
+        for on_written in callbacks:
+            try:
+                on_written(error)
+            except Exception as e:
+                logger.error(f"Listing writer callback failed: {e}")
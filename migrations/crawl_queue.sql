@@ -0,0 +1,17 @@
+-- Work queue of sharded crawls (`--shard` mode of the finders, lib/work_queue.py).
+-- Apply once, with a role that may create tables in fixnflip_v2:
+--     psql "$DATABASE_URL" -f migrations/crawl_queue.sql
+-- The finders only check that the table exists, they need no DDL rights.
+CREATE TABLE IF NOT EXISTS fixnflip_v2.crawl_queue (
+    id bigserial PRIMARY KEY,
+    crawl_id text NOT NULL,
+    source text NOT NULL,
+    category text NOT NULL,
+    location text NOT NULL,
+    status text NOT NULL DEFAULT 'pending',
+    worker text,
+    lease_until timestamptz,
+    attempts integer NOT NULL DEFAULT 0,
+    finished_at timestamptz,
+    UNIQUE (crawl_id, source, category, location)
+);